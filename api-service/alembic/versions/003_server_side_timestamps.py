@@ -0,0 +1,28 @@
+"""Server-side timestamps for bookings
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-01-20 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade() -> None:
+    # created_at/updated_at заполняет БД, INSERT ... RETURNING отдает их сразу
+    op.alter_column('bookings', 'created_at', server_default=UTC_NOW)
+    op.alter_column('bookings', 'updated_at', server_default=UTC_NOW)
+
+
+def downgrade() -> None:
+    op.alter_column('bookings', 'updated_at', server_default=None)
+    op.alter_column('bookings', 'created_at', server_default=None)
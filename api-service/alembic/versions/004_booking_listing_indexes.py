@@ -0,0 +1,39 @@
+"""Indexes for keyset-paginated booking listing
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_bookings_restaurant_datetime', ['restaurant_id', 'booking_datetime', 'id']),
+    ('ix_bookings_status_datetime', ['status', 'booking_datetime', 'id']),
+    ('ix_bookings_datetime', ['booking_datetime', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в большую таблицу, но требует autocommit
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(
+                name, 'bookings', columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name='bookings',
+                postgresql_concurrently=True, if_exists=True
+            )
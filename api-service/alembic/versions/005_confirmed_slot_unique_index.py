@@ -0,0 +1,36 @@
+"""Partial unique index on confirmed booking slots
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-02-10 00:00:00.000000
+
+Перед применением на существующих данных не должно быть двух CONFIRMED
+бронирований одного ресторана на одно время, иначе создание индекса упадет.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индекс и обслуживает проверку доступности, и исключает двойное подтверждение
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_bookings_confirmed_slot', 'bookings',
+            ['restaurant_id', 'booking_datetime'], unique=True,
+            postgresql_where=sa.text("status = 'CONFIRMED'"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_bookings_confirmed_slot', table_name='bookings',
+            postgresql_concurrently=True, if_exists=True
+        )
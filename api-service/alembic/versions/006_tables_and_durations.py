@@ -0,0 +1,104 @@
+"""Restaurant tables, booking duration and table overlap constraint
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-02-20 00:00:00.000000
+
+Рестораны без столов продолжают работать по слотам (одно подтвержденное
+бронирование на время), поэтому uq_bookings_confirmed_slot сужается до
+бронирований без стола. Пересечения визитов за одним столом исключает
+ограничение ex_bookings_table_overlap; для него нужно расширение btree_gist.
+Если расширение недоступно на сервере, ограничение не создается, и защитой
+остается advisory lock ресторана в Booking Service.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'restaurant_tables',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('restaurant_id', sa.Integer(), nullable=False),
+        sa.Column('number', sa.String(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.CheckConstraint('capacity > 0', name='ck_restaurant_tables_capacity'),
+        sa.ForeignKeyConstraint(['restaurant_id'], ['restaurants.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_restaurant_tables_id'), 'restaurant_tables', ['id'], unique=False)
+    op.create_index(
+        op.f('ix_restaurant_tables_restaurant_id'), 'restaurant_tables',
+        ['restaurant_id'], unique=False
+    )
+
+    op.add_column(
+        'restaurants',
+        sa.Column('booking_duration_minutes', sa.Integer(),
+                  server_default=sa.text('120'), nullable=False)
+    )
+    op.add_column('bookings', sa.Column('table_id', sa.Integer(), nullable=True))
+    op.add_column('bookings', sa.Column('duration_minutes', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'bookings_table_id_fkey', 'bookings', 'restaurant_tables',
+        ['table_id'], ['id']
+    )
+
+    bind = op.get_bind()
+    has_btree_gist = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'"
+    )).scalar()
+    if has_btree_gist:
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute(
+            "ALTER TABLE bookings ADD CONSTRAINT ex_bookings_table_overlap "
+            "EXCLUDE USING gist ("
+            "table_id WITH =, "
+            "tsrange(booking_datetime, "
+            "booking_datetime + duration_minutes * interval '1 minute') WITH &&"
+            ") WHERE (status = 'CONFIRMED' AND table_id IS NOT NULL)"
+        )
+
+    # Новый индекс строится рядом со старым, чтобы слоты не оставались без защиты
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_bookings_confirmed_slot_new', 'bookings',
+            ['restaurant_id', 'booking_datetime'], unique=True,
+            postgresql_where=sa.text("status = 'CONFIRMED' AND table_id IS NULL"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.drop_index(
+            'uq_bookings_confirmed_slot', table_name='bookings',
+            postgresql_concurrently=True, if_exists=True
+        )
+    op.execute('ALTER INDEX uq_bookings_confirmed_slot_new RENAME TO uq_bookings_confirmed_slot')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_bookings_confirmed_slot_old', 'bookings',
+            ['restaurant_id', 'booking_datetime'], unique=True,
+            postgresql_where=sa.text("status = 'CONFIRMED'"),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.drop_index(
+            'uq_bookings_confirmed_slot', table_name='bookings',
+            postgresql_concurrently=True, if_exists=True
+        )
+    op.execute('ALTER INDEX uq_bookings_confirmed_slot_old RENAME TO uq_bookings_confirmed_slot')
+
+    op.execute('ALTER TABLE bookings DROP CONSTRAINT IF EXISTS ex_bookings_table_overlap')
+    op.drop_constraint('bookings_table_id_fkey', 'bookings', type_='foreignkey')
+    op.drop_column('bookings', 'duration_minutes')
+    op.drop_column('bookings', 'table_id')
+    op.drop_column('restaurants', 'booking_duration_minutes')
+    op.drop_index(op.f('ix_restaurant_tables_restaurant_id'), table_name='restaurant_tables')
+    op.drop_index(op.f('ix_restaurant_tables_id'), table_name='restaurant_tables')
+    op.drop_table('restaurant_tables')
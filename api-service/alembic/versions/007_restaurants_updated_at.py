@@ -0,0 +1,42 @@
+"""Restaurants updated_at for the in-memory restaurant snapshot
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-03-01 00:00:00.000000
+
+API Service держит таблицу restaurants в памяти и перечитывает ее, когда
+меняется версия (число строк и max(updated_at)). Рестораны правятся
+и напрямую в БД, поэтому updated_at обновляет триггер, а не только ORM.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade() -> None:
+    op.add_column(
+        'restaurants',
+        sa.Column('updated_at', sa.DateTime(), server_default=UTC_NOW, nullable=False)
+    )
+    op.execute(
+        "CREATE FUNCTION restaurants_set_updated_at() RETURNS trigger AS $$ "
+        "BEGIN NEW.updated_at := timezone('utc', now()); RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        "CREATE TRIGGER restaurants_set_updated_at BEFORE UPDATE ON restaurants "
+        "FOR EACH ROW EXECUTE FUNCTION restaurants_set_updated_at()"
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS restaurants_set_updated_at ON restaurants')
+    op.execute('DROP FUNCTION IF EXISTS restaurants_set_updated_at()')
+    op.drop_column('restaurants', 'updated_at')
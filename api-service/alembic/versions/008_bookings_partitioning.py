@@ -0,0 +1,175 @@
+"""Monthly range partitioning of bookings by booking_datetime
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-03-15 00:00:00.000000
+
+bookings становится секционированной таблицей: секция на месяц
+(bookings_pYYYY_MM) и секция по умолчанию для дат, месяц которых еще
+не создан. Будущие секции создает функция bookings_ensure_partitions;
+ее вызывает API Service в фоне (app.partitions). Строки, попавшие
+в секцию по умолчанию, переносятся в созданную для их месяца секцию.
+
+Ключ секционирования входит в первичный ключ: (id, booking_datetime).
+Исключающее ограничение по пересечению визитов до Postgres 17 на
+секционированной таблице недоступно, поэтому при наличии btree_gist оно
+создается на каждой месячной секции (визиты на стыке месяцев по-прежнему
+разводит advisory lock ресторана в Booking Service).
+
+Данные копируются под EXCLUSIVE-блокировкой: чтение во время миграции
+работает, запись ждет ее окончания.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+# Сколько месяцев вперед создавать секции при миграции
+MONTHS_AHEAD = 3
+
+COLUMNS = (
+    'id, restaurant_id, booking_datetime, guests_count, status, '
+    'created_at, updated_at, table_id, duration_minutes'
+)
+
+TABLE_DDL = """
+CREATE TABLE bookings (
+    id integer NOT NULL DEFAULT nextval('bookings_id_seq'),
+    restaurant_id integer NOT NULL
+        CONSTRAINT bookings_restaurant_id_fkey REFERENCES restaurants (id),
+    booking_datetime timestamp without time zone NOT NULL,
+    guests_count integer NOT NULL,
+    status bookingstatus NOT NULL,
+    created_at timestamp without time zone NOT NULL DEFAULT timezone('utc', now()),
+    updated_at timestamp without time zone NOT NULL DEFAULT timezone('utc', now()),
+    table_id integer
+        CONSTRAINT bookings_table_id_fkey REFERENCES restaurant_tables (id),
+    duration_minutes integer
+){partition_by}
+"""
+
+INDEXES = (
+    'CREATE INDEX ix_bookings_id ON bookings (id)',
+    'CREATE INDEX ix_bookings_restaurant_datetime ON bookings (restaurant_id, booking_datetime, id)',
+    'CREATE INDEX ix_bookings_status_datetime ON bookings (status, booking_datetime, id)',
+    'CREATE INDEX ix_bookings_datetime ON bookings (booking_datetime, id)',
+    "CREATE UNIQUE INDEX uq_bookings_confirmed_slot ON bookings (restaurant_id, booking_datetime) "
+    "WHERE status = 'CONFIRMED' AND table_id IS NULL",
+)
+
+TABLE_OVERLAP = (
+    "EXCLUDE USING gist ("
+    "table_id WITH =, "
+    "tsrange(booking_datetime, "
+    "booking_datetime + duration_minutes * interval '1 minute') WITH &&"
+    ") WHERE (status = 'CONFIRMED' AND table_id IS NOT NULL)"
+)
+
+# Секция месяца: создается отдельной таблицей, принимает строки своего месяца
+# из секции по умолчанию (иначе ATTACH PARTITION отклонит пересекающийся
+# диапазон) и подключается к bookings. Advisory lock — секции создают
+# несколько worker'ов API Service. false, если секция уже есть.
+CREATE_PARTITION = """
+CREATE FUNCTION bookings_create_partition(month date) RETURNS boolean AS $$
+DECLARE
+    range_start timestamp := date_trunc('month', month);
+    range_end timestamp := date_trunc('month', month) + interval '1 month';
+    partition_name text := 'bookings_p' || to_char(date_trunc('month', month), 'YYYY_MM');
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('bookings_create_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE bookings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name
+    );
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM bookings_default '
+        'WHERE booking_datetime >= %L AND booking_datetime < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved', range_start, range_end, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE bookings ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, range_start, range_end
+    );
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'btree_gist') THEN
+        EXECUTE format(
+            'ALTER TABLE %I ADD CONSTRAINT %I {overlap}',
+            partition_name, partition_name || '_table_overlap'
+        );
+    END IF;
+    RETURN true;
+END
+$$ LANGUAGE plpgsql
+""".replace('{overlap}', TABLE_OVERLAP.replace("'", "''"))
+
+# Секции от текущего месяца (UTC) на months_ahead вперед; число созданных
+ENSURE_PARTITIONS = """
+CREATE FUNCTION bookings_ensure_partitions(months_ahead integer) RETURNS integer AS $$
+    SELECT count(*)::integer FROM generate_series(
+        date_trunc('month', timezone('utc', now())),
+        date_trunc('month', timezone('utc', now())) + months_ahead * interval '1 month',
+        interval '1 month'
+    ) AS month
+    WHERE bookings_create_partition(month::date)
+$$ LANGUAGE sql
+"""
+
+
+def upgrade() -> None:
+    op.execute('LOCK TABLE bookings IN EXCLUSIVE MODE')
+    op.execute('ALTER TABLE bookings RENAME TO bookings_unpartitioned')
+    op.execute('ALTER SEQUENCE bookings_id_seq OWNED BY NONE')
+
+    op.execute(TABLE_DDL.format(partition_by=' PARTITION BY RANGE (booking_datetime)'))
+    op.execute('CREATE TABLE bookings_default PARTITION OF bookings DEFAULT')
+    op.execute(CREATE_PARTITION)
+    op.execute(ENSURE_PARTITIONS)
+
+    # Секции для месяцев существующих бронирований и MONTHS_AHEAD вперед
+    op.execute(
+        "SELECT bookings_create_partition(month::date) FROM generate_series("
+        "(SELECT date_trunc('month', min(booking_datetime)) FROM bookings_unpartitioned), "
+        "(SELECT date_trunc('month', max(booking_datetime)) FROM bookings_unpartitioned), "
+        "interval '1 month') AS month"
+    )
+    op.execute(f'SELECT bookings_ensure_partitions({MONTHS_AHEAD})')
+    op.execute(
+        f'INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_unpartitioned'
+    )
+    op.execute('DROP TABLE bookings_unpartitioned')
+    op.execute('ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id')
+
+    # Индексы строятся после копирования и наследуются секциями
+    op.execute('ALTER TABLE bookings ADD PRIMARY KEY (id, booking_datetime)')
+    for statement in INDEXES:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute('LOCK TABLE bookings IN EXCLUSIVE MODE')
+    op.execute('ALTER TABLE bookings RENAME TO bookings_partitioned')
+    op.execute('ALTER SEQUENCE bookings_id_seq OWNED BY NONE')
+
+    op.execute(TABLE_DDL.format(partition_by=''))
+    op.execute(
+        f'INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_partitioned'
+    )
+    op.execute('DROP TABLE bookings_partitioned CASCADE')
+    op.execute('DROP FUNCTION bookings_ensure_partitions(integer)')
+    op.execute('DROP FUNCTION bookings_create_partition(date)')
+    op.execute('ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id')
+
+    op.execute('ALTER TABLE bookings ADD PRIMARY KEY (id)')
+    for statement in INDEXES:
+        op.execute(statement)
+    op.execute(
+        "DO $$ BEGIN "
+        "IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'btree_gist') THEN "
+        f"ALTER TABLE bookings ADD CONSTRAINT ex_bookings_table_overlap {TABLE_OVERLAP}; "
+        "END IF; END $$"
+    )
@@ -0,0 +1,27 @@
+"""Server-side UTC timestamps for outbox
+
+Revision ID: 010
+Revises: 009
+Create Date: 2024-03-25 00:00:00.000000
+
+created_at заполняет БД, как и у остальных таблиц: отправку (sent_at)
+и удаление отправленных событий API Service считает по тем же часам UTC.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade() -> None:
+    op.alter_column('outbox', 'created_at', server_default=UTC_NOW)
+
+
+def downgrade() -> None:
+    op.alter_column('outbox', 'created_at', server_default=None)
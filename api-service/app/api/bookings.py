@@ -1,28 +1,107 @@
 """API эндпоинты для бронирований"""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import base64
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select, tuple_
+from pydantic import ValidationError
+from app.api.etags import etag_matches, make_etag
 from app.db.database import get_db
 from app.models.booking import Booking, BookingStatus
-from app.schemas.booking import BookingCreate, BookingResponse
-from app.kafka.producer import kafka_producer
+from app.cache import booking_cache, idempotency_cache, restaurant_snapshot
+from app.config import settings
+from app.schemas.booking import (
+    BookingBatchCreate,
+    BookingBatchResponse,
+    BookingCreate,
+    BookingPage,
+    BookingResponse,
+    naive_utc,
+)
+from app.idempotency import (
+    StoredResponse,
+    claim_idempotency_key,
+    request_fingerprint,
+    save_idempotent_response,
+)
+from app.kafka.outbox import add_outbox_event, add_outbox_events, outbox_relay
+from app.waiters import booking_waiters
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
+# Статусы, после которых бронирование больше не меняется
+FINAL_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.REJECTED)
+FINAL_STATUS_VALUES = {s.value for s in FINAL_STATUSES}
+
+# Колонки ответа в порядке полей BookingResponse
+BOOKING_FIELDS = tuple(BookingResponse.model_fields)
+BOOKING_COLUMNS = tuple(getattr(Booking, name) for name in BOOKING_FIELDS)
+
+
+def booking_payload(row) -> dict:
+    """
+    Ответ BookingResponse из строки BOOKING_COLUMNS.
+
+    Данные из БД не валидируются повторно через pydantic: datetime
+    и BookingStatus сериализует ORJSONResponse в тот же JSON.
+    """
+    return dict(zip(BOOKING_FIELDS, row))
+
+
+def _booking_created_payload(booking) -> dict:
+    """Данные события booking.created"""
+    return {
+        "booking_id": booking.id,
+        "restaurant_id": booking.restaurant_id,
+        "booking_datetime": booking.booking_datetime.isoformat(),
+        "guests_count": booking.guests_count,
+    }
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Краткое описание ошибок валидации элемента пачки"""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _replay_response(key: str, request_hash: str, stored: StoredResponse) -> Response:
+    """Сохраненный ответ на повтор запроса с тем же Idempotency-Key"""
+    stored_hash, status_code, body = stored
+    if stored_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key уже использован с другим телом запроса",
+        )
+    idempotency_cache.set(key, stored, settings.idempotency_cache_ttl)
+    return Response(
+        body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
 
 @router.post(
     "",
     response_model=BookingResponse,
     status_code=status.HTTP_201_CREATED,
+    responses={
+        422: {"description": "Idempotency-Key уже использован с другим телом запроса"}
+    },
     summary="Создание нового бронирования",
-    description="Создает новое бронирование и отправляет событие в Kafka для обработки",
+    description="Создает новое бронирование и записывает событие в outbox для публикации в Kafka",
 )
 async def create_booking(
-    booking_data: BookingCreate, db: AsyncSession = Depends(get_db)
+    booking_data: BookingCreate,
+    idempotency_key: str | None = Header(default=None, min_length=1, max_length=255),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Создание нового бронирования столика.
@@ -30,58 +109,352 @@ async def create_booking(
     - **restaurant_id**: ID ресторана
     - **booking_datetime**: Дата и время бронирования
     - **guests_count**: Количество гостей
+
+    С заголовком Idempotency-Key повтор запроса (например, после таймаута)
+    возвращает исходный ответ без нового бронирования и события.
     """
-    # Создаем запись о бронировании
-    booking = Booking(
-        restaurant_id=booking_data.restaurant_id,
-        booking_datetime=booking_data.booking_datetime,
-        guests_count=booking_data.guests_count,
-        status=BookingStatus.CREATED,
+    if idempotency_key is not None:
+        request_hash = request_fingerprint(booking_data)
+        stored = idempotency_cache.get(idempotency_key)
+        if stored is not None:
+            return _replay_response(idempotency_key, request_hash, stored)
+
+    # Несуществующий ресторан отсекается по снимку в памяти, до FK-ошибки в БД
+    if not await restaurant_snapshot.exists(db, booking_data.restaurant_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ресторан с ID {booking_data.restaurant_id} не найден",
+        )
+
+    # Ключ занимается в транзакции бронирования: ответ сохраняется тем же коммитом
+    if idempotency_key is not None:
+        stored = await claim_idempotency_key(db, idempotency_key, request_hash)
+        if stored is not None:
+            return _replay_response(idempotency_key, request_hash, stored)
+
+    # Создаем запись о бронировании: один INSERT ... RETURNING отдает
+    # id и серверные created_at/updated_at без дополнительного SELECT
+    result = await db.execute(
+        insert(Booking)
+        .values(
+            restaurant_id=booking_data.restaurant_id,
+            booking_datetime=booking_data.booking_datetime,
+            guests_count=booking_data.guests_count,
+            status=BookingStatus.CREATED,
+        )
+        .returning(*BOOKING_COLUMNS)
     )
+    booking = result.one()
 
-    db.add(booking)
+    # Событие пишется в outbox в той же транзакции, что и бронирование,
+    # и публикуется в Kafka фоновым relay
+    add_outbox_event(
+        db, event_type="booking.created", data=_booking_created_payload(booking)
+    )
+    response = ORJSONResponse(
+        booking_payload(booking), status_code=status.HTTP_201_CREATED
+    )
+    if idempotency_key is not None:
+        await save_idempotent_response(
+            db, idempotency_key, response.status_code, response.body
+        )
     await db.commit()
-    await db.refresh(booking)
+    outbox_relay.notify()
+    if idempotency_key is not None:
+        idempotency_cache.set(
+            idempotency_key,
+            (request_hash, response.status_code, response.body),
+            settings.idempotency_cache_ttl,
+        )
 
     logger.info(f"Booking created: id={booking.id}")
 
-    # Отправляем событие в Kafka
+    return response
+
+
+def _encode_cursor(booking) -> str:
+    """Курсор keyset-пагинации: позиция последнего элемента страницы"""
+    raw = f"{booking.booking_datetime.isoformat()}|{booking.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Разбор курсора; некорректный курсор — ошибка клиента"""
     try:
-        kafka_producer.send_event(
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        booking_datetime, booking_id = raw.split("|")
+        return naive_utc(datetime.fromisoformat(booking_datetime)), int(booking_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации",
+        )
+
+
+@router.get(
+    "",
+    response_model=BookingPage,
+    summary="Список бронирований",
+    description="Возвращает бронирования по фильтрам с keyset-пагинацией",
+)
+async def list_bookings(
+    restaurant_id: int | None = Query(None, gt=0, description="ID ресторана"),
+    date_from: datetime | None = Query(
+        None, alias="from", description="Начало периода"
+    ),
+    date_to: datetime | None = Query(None, alias="to", description="Конец периода"),
+    booking_status: BookingStatus | None = Query(
+        None, alias="status", description="Статус бронирования"
+    ),
+    after: str | None = Query(None, description="Курсор из next_cursor"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Список бронирований, упорядоченный по (booking_datetime, id).
+
+    Страницы фиксированного размера; следующая страница запрашивается с
+    `after=next_cursor`. Вместо OFFSET используется условие
+    `(booking_datetime, id) > курсор`, поэтому глубокие страницы стоят
+    столько же, сколько первая.
+    """
+    query = select(*BOOKING_COLUMNS)
+    if restaurant_id is not None:
+        query = query.where(Booking.restaurant_id == restaurant_id)
+    if booking_status is not None:
+        query = query.where(Booking.status == booking_status)
+    if date_from is not None:
+        query = query.where(Booking.booking_datetime >= naive_utc(date_from))
+    if date_to is not None:
+        query = query.where(Booking.booking_datetime < naive_utc(date_to))
+    if after is not None:
+        query = query.where(
+            tuple_(Booking.booking_datetime, Booking.id) > _decode_cursor(after)
+        )
+
+    page_size = settings.bookings_page_size
+    # Лишняя строка показывает, есть ли следующая страница
+    result = await db.execute(
+        query.order_by(Booking.booking_datetime, Booking.id).limit(page_size + 1)
+    )
+    bookings = result.all()
+
+    next_cursor = None
+    if len(bookings) > page_size:
+        bookings = bookings[:page_size]
+        next_cursor = _encode_cursor(bookings[-1])
+
+    return ORJSONResponse(
+        {
+            "items": [booking_payload(booking) for booking in bookings],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=BookingBatchResponse,
+    summary="Пакетное создание бронирований",
+    description="Создает пачку бронирований одним INSERT и одним коммитом",
+)
+async def create_bookings_batch(
+    batch: BookingBatchCreate, db: AsyncSession = Depends(get_db)
+):
+    """
+    Пакетное создание бронирований для партнерских интеграций.
+
+    - **items**: список бронирований в формате `POST /bookings`
+
+    Каждый элемент валидируется отдельно; в ответе для каждого элемента
+    возвращается созданное бронирование или описание ошибки.
+    """
+    # Элементы ответа в формате BookingBatchItemResult
+    results: list[dict] = []
+    valid: list[tuple[int, BookingCreate]] = []
+    for index, item in enumerate(batch.items):
+        try:
+            valid.append((index, BookingCreate.model_validate(item)))
+        except ValidationError as e:
+            results.append(
+                {
+                    "index": index,
+                    "booking": None,
+                    "error": _format_validation_error(e),
+                }
+            )
+
+    # Несуществующий ресторан дал бы FK-ошибку на весь INSERT — отсеиваем заранее
+    restaurant_ids = {item.restaurant_id for _, item in valid}
+    if restaurant_ids:
+        unknown = {
+            restaurant_id
+            for restaurant_id in restaurant_ids
+            if not await restaurant_snapshot.exists(db, restaurant_id)
+        }
+        if unknown:
+            results.extend(
+                {
+                    "index": index,
+                    "booking": None,
+                    "error": f"Ресторан с ID {item.restaurant_id} не найден",
+                }
+                for index, item in valid
+                if item.restaurant_id in unknown
+            )
+            valid = [
+                (i, item) for i, item in valid if item.restaurant_id not in unknown
+            ]
+
+    if valid:
+        # Один многострочный INSERT ... RETURNING в порядке параметров
+        result = await db.execute(
+            insert(Booking).returning(*BOOKING_COLUMNS, sort_by_parameter_order=True),
+            [
+                {
+                    "restaurant_id": item.restaurant_id,
+                    "booking_datetime": item.booking_datetime,
+                    "guests_count": item.guests_count,
+                    "status": BookingStatus.CREATED,
+                }
+                for _, item in valid
+            ],
+        )
+        bookings = result.all()
+
+        add_outbox_events(
+            db,
             event_type="booking.created",
-            data={
-                "booking_id": booking.id,
-                "restaurant_id": booking.restaurant_id,
-                "booking_datetime": booking.booking_datetime.isoformat(),
-                "guests_count": booking.guests_count,
-            },
+            items=[_booking_created_payload(booking) for booking in bookings],
         )
-    except Exception as e:
-        logger.error(f"Failed to send Kafka event: {e}")
-        # Не падаем, если Kafka недоступна
+        await db.commit()
+        outbox_relay.notify()
+
+        results.extend(
+            {"index": index, "booking": booking_payload(booking), "error": None}
+            for (index, _), booking in zip(valid, bookings)
+        )
+        logger.info(f"Batch created: {len(bookings)} bookings")
+
+    results.sort(key=lambda r: r["index"])
+    return ORJSONResponse(
+        {
+            "created": len(valid),
+            "failed": len(batch.items) - len(valid),
+            "results": results,
+        }
+    )
+
 
-    return booking
+def booking_etag(booking) -> str:
+    """ETag ответа: меняется вместе со статусом и updated_at"""
+    return make_etag(
+        f"{booking.id}:{booking.status.value}:{booking.updated_at.isoformat()}"
+    )
+
+
+def invalidate_booking_cache(data: dict):
+    """Сброс кэша бронирования по событию booking.status_changed"""
+    booking_cache.invalidate(data.get("booking_id"))
 
 
 @router.get(
     "/{booking_id}",
     response_model=BookingResponse,
+    responses={304: {"description": "Бронирование не изменилось (If-None-Match)"}},
     summary="Получение информации о бронировании",
     description="Возвращает информацию о бронировании по его ID",
 )
-async def get_booking(booking_id: int, db: AsyncSession = Depends(get_db)):
+async def get_booking(
+    booking_id: int,
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Получение информации о бронировании.
 
     - **booking_id**: ID бронирования
+
+    Ответ кэшируется в памяти worker'а: бронирования в финальном статусе
+    надолго, остальные — до события смены статуса (или короткого TTL).
+    Поддерживается If-None-Match → 304.
     """
-    result = await db.execute(select(Booking).where(Booking.id == booking_id))
-    booking = result.scalar_one_or_none()
+    payload, etag = await _load_booking(booking_id, db)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return ORJSONResponse(payload, headers={"ETag": etag})
 
-    if not booking:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Бронирование с ID {booking_id} не найдено",
+
+@router.get(
+    "/{booking_id}/wait",
+    response_model=BookingResponse,
+    summary="Ожидание финального статуса бронирования",
+    description=(
+        "Long-poll: отвечает, как только бронирование подтверждено или отклонено, "
+        "либо по истечении timeout с текущим статусом"
+    ),
+)
+async def wait_booking(
+    booking_id: int,
+    timeout: float = Query(default=30.0, gt=0, le=settings.booking_wait_max_timeout),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Ожидание финального статуса бронирования.
+
+    - **booking_id**: ID бронирования
+    - **timeout**: сколько секунд ждать (не больше booking_wait_max_timeout)
+
+    Запрос будит событие booking.status_changed из общего listener'а
+    worker'а. На время ожидания соединение с БД возвращается в пул;
+    без событий статус перечитывается (через кэш) раз в
+    booking_wait_recheck_interval секунд.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # Подписка до чтения статуса: событие между чтением и ожиданием не теряется
+    signal = booking_waiters.subscribe(booking_id)
+    try:
+        while True:
+            signal.clear()
+            payload, etag = await _load_booking(booking_id, db)
+            await db.close()
+            remaining = deadline - loop.time()
+            if payload["status"] in FINAL_STATUS_VALUES or remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(
+                    signal.wait(),
+                    min(remaining, settings.booking_wait_recheck_interval),
+                )
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        booking_waiters.unsubscribe(booking_id, signal)
+    return ORJSONResponse(payload, headers={"ETag": etag})
+
+
+async def _load_booking(booking_id: int, db: AsyncSession) -> tuple[dict, str]:
+    """Ответ GET /bookings/{id} и его ETag: из кэша worker'а или из БД"""
+    cached = booking_cache.get(booking_id)
+    if cached is None:
+        result = await db.execute(
+            select(*BOOKING_COLUMNS).where(Booking.id == booking_id)
         )
+        booking = result.one_or_none()
 
-    return booking
+        if not booking:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Бронирование с ID {booking_id} не найдено",
+            )
+
+        cached = (booking_payload(booking), booking_etag(booking))
+        ttl = (
+            settings.booking_cache_final_ttl
+            if booking.status in FINAL_STATUSES
+            else settings.booking_cache_pending_ttl
+        )
+        booking_cache.set(booking_id, cached, ttl)
+    return cached
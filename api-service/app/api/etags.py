@@ -0,0 +1,16 @@
+"""ETag и условные запросы (If-None-Match)"""
+
+import hashlib
+
+
+def make_etag(version: str) -> str:
+    """Короткий сильный ETag по строке версии ресурса"""
+    return f'"{hashlib.blake2b(version.encode(), digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Проверка заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
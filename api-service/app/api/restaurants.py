@@ -0,0 +1,165 @@
+"""API эндпоинты для ресторанов"""
+
+from datetime import date, datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.etags import etag_matches
+from app.availability import DayAvailability, availability_cache
+from app.cache import restaurant_snapshot
+from app.config import settings
+from app.db.database import get_db
+from app.schemas.restaurant import RestaurantAvailability, RestaurantResponse
+
+router = APIRouter(prefix="/restaurants", tags=["Restaurants"])
+
+
+def _respond(payload, etag: str, if_none_match: str | None) -> Response:
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return ORJSONResponse(payload, headers={"ETag": etag})
+
+
+@router.get(
+    "",
+    response_model=list[RestaurantResponse],
+    responses={304: {"description": "Список не изменился (If-None-Match)"}},
+    summary="Список ресторанов",
+    description="Возвращает все рестораны, отсортированные по ID",
+)
+async def list_restaurants(
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Список ресторанов.
+
+    Отдается из снимка таблицы в памяти worker'а; ETag меняется вместе
+    с версией таблицы. Поддерживается If-None-Match → 304.
+    """
+    await restaurant_snapshot.refresh(db)
+    return _respond(
+        restaurant_snapshot.listing, restaurant_snapshot.etag, if_none_match
+    )
+
+
+@router.get(
+    "/{restaurant_id}",
+    response_model=RestaurantResponse,
+    responses={304: {"description": "Ресторан не изменился (If-None-Match)"}},
+    summary="Получение информации о ресторане",
+    description="Возвращает информацию о ресторане по его ID",
+)
+async def get_restaurant(
+    restaurant_id: int,
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Получение информации о ресторане.
+
+    - **restaurant_id**: ID ресторана
+    """
+    payload, etag = await _get_restaurant(db, restaurant_id)
+    return _respond(payload, etag, if_none_match)
+
+
+async def _get_restaurant(db: AsyncSession, restaurant_id: int) -> tuple[dict, str]:
+    """Ресторан из снимка; неизвестный — 404"""
+    await restaurant_snapshot.refresh(db)
+    cached = restaurant_snapshot.restaurants.get(restaurant_id)
+    if cached is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ресторан с ID {restaurant_id} не найден",
+        )
+    return cached
+
+
+def _check_horizon(first_day: date, days: int):
+    """Дни вне горизонта бронирования — ошибка клиента"""
+    today = datetime.now(timezone.utc).date()
+    # Вчера по UTC — еще сегодня для ресторанов западнее Гринвича
+    if (
+        first_day < today - timedelta(days=1)
+        or (first_day - today).days + days > settings.availability_horizon_days
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(
+                "Слоты доступны со вчерашнего дня на "
+                f"{settings.availability_horizon_days} дней вперед"
+            ),
+        )
+
+
+def _availability_payload(
+    restaurant_id: int, duration: int, guests: int, day: DayAvailability
+) -> dict:
+    return {
+        "restaurant_id": restaurant_id,
+        "date": day.day,
+        "guests": guests,
+        "slot_minutes": day.slot_minutes,
+        "duration_minutes": duration,
+        "free_slots": day.free_slots(guests),
+    }
+
+
+@router.get(
+    "/{restaurant_id}/availability",
+    response_model=RestaurantAvailability,
+    summary="Свободные слоты ресторана на день",
+    description="Начала слотов, в которые есть свободный стол на указанное число гостей",
+)
+async def get_availability(
+    restaurant_id: int,
+    day: date = Query(..., alias="date", description="День"),
+    guests: int = Query(1, gt=0, description="Количество гостей"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Свободные слоты ресторана на день.
+
+    - **date**: день (YYYY-MM-DD)
+    - **guests**: количество гостей
+
+    Занятость считается по подтвержденным бронированиям одним запросом
+    и кэшируется на день ресторана до подтверждения нового бронирования.
+    """
+    _check_horizon(day, 1)
+    payload, _ = await _get_restaurant(db, restaurant_id)
+    duration = payload["booking_duration_minutes"]
+    (availability,) = await availability_cache.get(db, restaurant_id, duration, day)
+    return ORJSONResponse(
+        _availability_payload(restaurant_id, duration, guests, availability)
+    )
+
+
+@router.get(
+    "/{restaurant_id}/availability/week",
+    response_model=list[RestaurantAvailability],
+    summary="Свободные слоты ресторана на неделю",
+    description="Свободные слоты на 7 дней, начиная с указанного, одним запросом",
+)
+async def get_week_availability(
+    restaurant_id: int,
+    start: date = Query(..., description="Первый день"),
+    guests: int = Query(1, gt=0, description="Количество гостей"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Свободные слоты ресторана на неделю.
+
+    - **start**: первый день (YYYY-MM-DD)
+    - **guests**: количество гостей
+    """
+    _check_horizon(start, 7)
+    payload, _ = await _get_restaurant(db, restaurant_id)
+    duration = payload["booking_duration_minutes"]
+    week = await availability_cache.get(db, restaurant_id, duration, start, days=7)
+    return ORJSONResponse(
+        [_availability_payload(restaurant_id, duration, guests, day) for day in week]
+    )
@@ -0,0 +1,206 @@
+"""Свободные слоты ресторанов: расчет на сетке занятости NumPy"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import TTLCache
+from app.config import settings
+from app.models.booking import Booking, BookingStatus
+from app.models.restaurant_table import RestaurantTable
+
+MINUTES_PER_DAY = 24 * 60
+
+
+@dataclass
+class DayAvailability:
+    """
+    Свободные слоты ресторана на один день.
+
+    free — bool-массив (столы, слоты): стол свободен на весь визит,
+    начинающийся в слоте. У ресторана без столов одна строка: слот свободен,
+    если на это время нет подтвержденного бронирования.
+    """
+
+    day: date
+    slot_minutes: int
+    capacities: Optional[np.ndarray]
+    free: np.ndarray
+
+    def free_slots(self, guests: int) -> list[datetime]:
+        """Начала слотов, в которые есть свободный стол на guests гостей"""
+        if self.capacities is None:
+            available = self.free[0]
+        else:
+            fits = self.capacities >= guests
+            available = (self.free & fits[:, None]).any(axis=0)
+        start = datetime.combine(self.day, time())
+        step = timedelta(minutes=self.slot_minutes)
+        return [start + step * int(i) for i in np.flatnonzero(available)]
+
+
+def _minutes_since(origin: datetime, moments: list[datetime]) -> np.ndarray:
+    """Минуты от origin (с отбрасыванием секунд) для списка моментов"""
+    values = np.array(moments, dtype="datetime64[m]")
+    return (values - np.datetime64(origin, "m")).astype(np.int64)
+
+
+def free_tables(
+    first_day: date,
+    days: int,
+    slot_minutes: int,
+    duration: int,
+    tables: list[tuple[int, int]],
+    visits: list[tuple[int, datetime, int]],
+) -> np.ndarray:
+    """
+    Свободные столы по слотам: bool-массив (дни, столы, слоты дня).
+
+    Визиты (table_id, начало, минуты) отмечаются на поминутной сетке
+    столов разностным массивом и cumsum; свободность визита длиной
+    duration с начала каждого слота — разность префиксных сумм занятых минут.
+    """
+    origin = datetime.combine(first_day, time())
+    span = days * MINUTES_PER_DAY + duration
+    row = {table_id: i for i, (table_id, _) in enumerate(tables)}
+    visits = [v for v in visits if v[0] in row]
+
+    marks = np.zeros((len(tables), span + 1), dtype=np.int32)
+    if visits:
+        rows = np.array([row[table_id] for table_id, _, _ in visits])
+        starts = _minutes_since(origin, [start for _, start, _ in visits])
+        ends = starts + np.array([minutes for _, _, minutes in visits])
+        np.add.at(marks, (rows, np.clip(starts, 0, span)), 1)
+        np.add.at(marks, (rows, np.clip(ends, 0, span)), -1)
+    busy = np.cumsum(marks[:, :span], axis=1) > 0
+
+    prefix = np.zeros((len(tables), span + 1), dtype=np.int32)
+    np.cumsum(busy, axis=1, out=prefix[:, 1:])
+    slot_starts = np.arange(0, days * MINUTES_PER_DAY, slot_minutes)
+    free = prefix[:, slot_starts + duration] == prefix[:, slot_starts]
+    return free.reshape(len(tables), days, -1).transpose(1, 0, 2)
+
+
+def free_slots_without_tables(
+    first_day: date, days: int, slot_minutes: int, taken: list[datetime]
+) -> np.ndarray:
+    """Свободные слоты ресторана без столов: bool-массив (дни, 1, слоты дня)"""
+    origin = datetime.combine(first_day, time())
+    slots = days * MINUTES_PER_DAY // slot_minutes
+    free = np.ones(slots, dtype=bool)
+    # Слот занимает только бронирование ровно на его время
+    aligned = [t for t in taken if not t.second and not t.microsecond]
+    if aligned:
+        offsets = _minutes_since(origin, aligned)
+        offsets = offsets[(offsets >= 0) & (offsets % slot_minutes == 0)]
+        free[offsets[offsets < days * MINUTES_PER_DAY] // slot_minutes] = False
+    return free.reshape(days, 1, -1)
+
+
+class AvailabilityCache:
+    """
+    Рассчитанные дни ресторанов: (restaurant_id, day) -> DayAvailability.
+
+    Дни без кэша рассчитываются вместе: одним запросом подтвержденных
+    визитов за весь диапазон (индекс ix_bookings_restaurant_datetime).
+    Подтверждение бронирования сбрасывает его день и соседние: визит
+    может переходить через полночь.
+    """
+
+    def __init__(self):
+        self._days = TTLCache(maxsize=settings.availability_cache_size)
+
+    async def get(
+        self,
+        db: AsyncSession,
+        restaurant_id: int,
+        duration: int,
+        first_day: date,
+        days: int = 1,
+    ) -> list[DayAvailability]:
+        wanted = [first_day + timedelta(days=i) for i in range(days)]
+        cached = [self._days.get((restaurant_id, day)) for day in wanted]
+        if all(cached):
+            return cached
+
+        missing = [day for day, item in zip(wanted, cached) if item is None]
+        computed = await self._compute(
+            db,
+            restaurant_id,
+            duration,
+            missing[0],
+            (missing[-1] - missing[0]).days + 1,
+        )
+        for item in computed:
+            self._days.set(
+                (restaurant_id, item.day), item, settings.availability_cache_ttl
+            )
+        by_day = {item.day: item for item in computed}
+        return [item or by_day[day] for day, item in zip(wanted, cached)]
+
+    async def _compute(
+        self,
+        db: AsyncSession,
+        restaurant_id: int,
+        duration: int,
+        first_day: date,
+        days: int,
+    ) -> list[DayAvailability]:
+        slot_minutes = settings.availability_slot_minutes
+        origin = datetime.combine(first_day, time())
+        result = await db.execute(
+            select(RestaurantTable.id, RestaurantTable.capacity)
+            .where(RestaurantTable.restaurant_id == restaurant_id)
+            .order_by(RestaurantTable.id)
+        )
+        tables = result.tuples().all()
+        # Визиты прошлого дня могут заходить на первый день диапазона
+        result = await db.execute(
+            select(
+                Booking.table_id,
+                Booking.booking_datetime,
+                func.coalesce(Booking.duration_minutes, duration),
+            ).where(
+                Booking.restaurant_id == restaurant_id,
+                Booking.booking_datetime >= origin - timedelta(days=1),
+                Booking.booking_datetime
+                < origin + timedelta(days=days, minutes=duration),
+                Booking.status == BookingStatus.CONFIRMED,
+            )
+        )
+        visits = result.tuples().all()
+
+        if tables:
+            capacities = np.array([capacity for _, capacity in tables])
+            free = free_tables(first_day, days, slot_minutes, duration, tables, visits)
+        else:
+            capacities = None
+            free = free_slots_without_tables(
+                first_day, days, slot_minutes, [start for _, start, _ in visits]
+            )
+        return [
+            DayAvailability(
+                first_day + timedelta(days=i), slot_minutes, capacities, free[i]
+            )
+            for i in range(days)
+        ]
+
+    def invalidate(self, data: dict):
+        """Обработчик booking.status_changed: подтверждение занимает слоты"""
+        if data.get("status") != BookingStatus.CONFIRMED.value:
+            return
+        try:
+            day = datetime.fromisoformat(data["booking_datetime"]).date()
+        except (KeyError, TypeError, ValueError):
+            return
+        for offset in (-1, 0, 1):
+            self._days.invalidate((data.get("restaurant_id"), day + timedelta(offset)))
+
+    def clear(self):
+        self._days.clear()
+
+
+# Singleton instance
+availability_cache = AvailabilityCache()
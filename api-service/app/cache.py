@@ -0,0 +1,145 @@
+"""In-process кэши API Service"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.etags import make_etag
+from app.config import settings
+from app.models.restaurant import Restaurant
+from app.schemas.restaurant import RestaurantResponse
+
+
+class TTLCache:
+    """
+    Ограниченный LRU-кэш с TTL на каждую запись.
+
+    Не потокобезопасен: рассчитан на использование из одного event loop.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Значение по ключу или None, если его нет или истек TTL"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        """Сохранение значения на ttl секунд с вытеснением самых старых"""
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Удаление записи"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Очистка кэша"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RestaurantSnapshot:
+    """
+    Таблица restaurants целиком в памяти worker'а.
+
+    Ресторанов немного, и меняются они редко, поэтому каталог и проверка
+    restaurant_id при создании бронирования обходятся без БД. Не чаще раза
+    в restaurant_snapshot_interval секунд одним запросом сверяется версия
+    таблицы (число строк и max(updated_at)); строки перечитываются, только
+    если версия изменилась.
+    """
+
+    def __init__(self):
+        # restaurant_id -> (payload, etag)
+        self.restaurants: dict[int, tuple[dict, str]] = {}
+        self.listing: list[dict] = []
+        self.etag = make_etag("")
+        self._version: Optional[tuple] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db: AsyncSession, max_age: Optional[float] = None):
+        """Сверка версии таблицы, если последняя была раньше max_age секунд назад"""
+        if max_age is None:
+            max_age = settings.restaurant_snapshot_interval
+        if time.monotonic() - self._checked_at < max_age:
+            return
+        # Одновременные запросы ждут одну сверку, а не делают каждый свою
+        async with self._lock:
+            if time.monotonic() - self._checked_at < max_age:
+                return
+            result = await db.execute(
+                select(func.count(), func.max(Restaurant.updated_at))
+            )
+            version = tuple(result.one())
+            if version != self._version:
+                result = await db.execute(select(Restaurant).order_by(Restaurant.id))
+                self._load(result.scalars().all(), version)
+            self._checked_at = time.monotonic()
+
+    def _load(self, restaurants: list[Restaurant], version: tuple):
+        self.restaurants = {
+            r.id: (
+                RestaurantResponse.model_validate(r).model_dump(mode="json"),
+                make_etag(f"{r.id}:{r.updated_at.isoformat()}"),
+            )
+            for r in restaurants
+        }
+        self.listing = [payload for payload, _ in self.restaurants.values()]
+        count, updated_at = version
+        self.etag = make_etag(f"{count}:{updated_at and updated_at.isoformat()}")
+        self._version = version
+
+    async def exists(self, db: AsyncSession, restaurant_id: int) -> bool:
+        """
+        Ресторан есть в снимке.
+
+        При промахе версия сверяется еще раз (не чаще раза в
+        restaurant_snapshot_miss_interval секунд): ресторан мог появиться
+        после последней сверки.
+        """
+        await self.refresh(db)
+        if restaurant_id in self.restaurants:
+            return True
+        await self.refresh(db, settings.restaurant_snapshot_miss_interval)
+        return restaurant_id in self.restaurants
+
+    def clear(self):
+        """Сброс снимка: следующий запрос перечитает таблицу"""
+        self.restaurants = {}
+        self.listing = []
+        self._version = None
+        self._checked_at = float("-inf")
+
+
+# Кэш ответов GET /bookings/{id}: booking_id -> (payload, etag)
+booking_cache = TTLCache(maxsize=settings.booking_cache_size)
+
+# Ответы POST /bookings по Idempotency-Key: key -> (request_hash, status_code, body)
+idempotency_cache = TTLCache(maxsize=settings.idempotency_cache_size)
+
+# Снимок ресторанов для /restaurants и проверки restaurant_id
+restaurant_snapshot = RestaurantSnapshot()
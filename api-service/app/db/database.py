@@ -1,13 +1,34 @@
 """Конфигурация базы данных"""
 
+import logging
+import random
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
+from app.db.pool import InstrumentedQueuePool
+
+logger = logging.getLogger(__name__)
 
 # Заменяем postgresql:// на postgresql+asyncpg:// для asyncpg драйвера
 DATABASE_URL = settings.database_url.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Кэш подготовленных запросов: asyncpg и диалекта SQLAlchemy
+# (0 отключает оба, например, за pgbouncer в transaction mode)
+engine = create_async_engine(
+    make_url(DATABASE_URL).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+    ),
+    echo=settings.db_echo,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_recycle=settings.db_pool_recycle,
+    connect_args={"statement_cache_size": settings.db_statement_cache_size},
+)
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -15,6 +36,15 @@ async_session_maker = async_sessionmaker(
 Base = declarative_base()
 
 
+if not settings.db_echo and settings.db_echo_sample_rate > 0:
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _log_sampled_statement(conn, cursor, statement, parameters, context, many):
+        """Логирование доли запросов вместо полного echo"""
+        if random.random() < settings.db_echo_sample_rate:
+            logger.info(f"SQL: {statement}")
+
+
 async def get_db():
     """Dependency для получения сессии БД"""
     async with async_session_maker() as session:
@@ -0,0 +1,132 @@
+"""Idempotency-Key для POST /bookings: ключи и сохраненные ответы в БД"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import async_session_maker
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# Сохраненный ответ: (request_hash, status_code, body)
+StoredResponse = tuple[str, int, bytes]
+
+UTC_NOW = func.timezone("utc", func.now())
+
+
+def request_fingerprint(data: BaseModel) -> str:
+    """Отпечаток провалидированного тела запроса"""
+    return hashlib.blake2b(data.model_dump_json().encode(), digest_size=16).hexdigest()
+
+
+async def claim_idempotency_key(
+    db: AsyncSession, key: str, request_hash: str
+) -> Optional[StoredResponse]:
+    """
+    Занятие ключа в текущей транзакции.
+
+    None — ключ новый (или истек) и занят этим запросом: ответ сохраняет
+    save_idempotent_response до коммита той же транзакции. Иначе —
+    сохраненный ответ. Параллельный запрос с тем же ключом ждет на
+    первичном ключе коммита первого и получает его ответ; при откате
+    первого ключ занимает он.
+    """
+    expires_at = UTC_NOW + timedelta(seconds=settings.idempotency_key_ttl)
+    stmt = pg_insert(IdempotencyKey).values(
+        key=key, request_hash=request_hash, expires_at=expires_at
+    )
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "status_code": None,
+                "response_body": None,
+                "created_at": UTC_NOW,
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=IdempotencyKey.expires_at < UTC_NOW,
+        ).returning(IdempotencyKey.key)
+    )
+    if result.first() is not None:
+        return None
+
+    result = await db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response_body,
+        ).where(IdempotencyKey.key == key)
+    )
+    return tuple(result.one())
+
+
+async def save_idempotent_response(
+    db: AsyncSession, key: str, status_code: int, body: bytes
+):
+    """Ответ занятого ключа; пишется в транзакции создания бронирования"""
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == key)
+        .values(status_code=status_code, response_body=body)
+    )
+
+
+async def purge_expired_keys(session_maker, batch_size: int) -> int:
+    """Удаление пачки истекших ключей; возвращает число удаленных"""
+    async with session_maker() as db:
+        expired = (
+            select(IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at < UTC_NOW)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired))
+        )
+        await db.commit()
+        return result.rowcount
+
+
+class IdempotencyKeyPurger:
+    """Фоновое удаление истекших ключей идемпотентности"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        batch_size = settings.idempotency_purge_batch_size
+        while True:
+            try:
+                # Полная пачка — вероятно, есть еще истекшие ключи
+                purged = batch_size
+                while purged == batch_size:
+                    purged = await purge_expired_keys(self.session_maker, batch_size)
+            except Exception as e:
+                logger.error(f"Idempotency keys purge error: {e}")
+            await asyncio.sleep(settings.idempotency_purge_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+idempotency_key_purger = IdempotencyKeyPurger()
@@ -0,0 +1,155 @@
+"""
+Кодеки значений сообщений Kafka.
+
+Формат сообщения передается заголовком codec, поэтому consumer'ы читают
+вперемешку JSON и бинарные сообщения, а producer'ы переключаются
+настройкой по одному. Сообщения без заголовка — JSON (прежние producer'ы).
+Копия модуля — app/codec.py в Booking Service: схемы должны совпадать.
+"""
+
+import json
+import struct
+from datetime import datetime, timedelta
+from typing import Optional
+
+CODEC_HEADER = "codec"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+STATUSES = ("CREATED", "CHECKING_AVAILABILITY", "CONFIRMED", "REJECTED")
+
+
+class JsonCodec:
+    """JSON с ISO-датами и именами полей в каждом сообщении"""
+
+    name = "json"
+
+    def encode(self, event: dict) -> Optional[bytes]:
+        return json.dumps(event).encode("utf-8")
+
+    def decode(self, value: bytes) -> dict:
+        return json.loads(value.decode("utf-8"))
+
+
+def _pack_int(value) -> int:
+    if type(value) is not int:
+        raise ValueError(value)
+    return value
+
+
+def _pack_datetime(value) -> int:
+    """ISO-строка без timezone -> микросекунды от эпохи"""
+    moment = datetime.fromisoformat(value)
+    # Кодируем только строки, которые decode восстановит символ в символ
+    if moment.tzinfo is not None or moment.isoformat() != value:
+        raise ValueError(value)
+    return (moment - EPOCH) // MICROSECOND
+
+
+def _unpack_datetime(value: int) -> str:
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def _pack_status(value) -> int:
+    return STATUSES.index(value)
+
+
+# Тип поля data: (формат struct, упаковка, распаковка)
+INT64 = ("q", _pack_int, int)
+INT32 = ("i", _pack_int, int)
+DATETIME = ("q", _pack_datetime, _unpack_datetime)
+STATUS = ("B", _pack_status, STATUSES.__getitem__)
+
+
+class StructCodecV1:
+    """
+    Бинарный формат v1: байт типа события и поля data фиксированной
+    раскладкой struct, время — микросекунды от эпохи (UTC).
+
+    Схема описывает ровно те поля, которые публикуют сервисы. Событие
+    с другим набором полей или значением, не укладывающимся в схему,
+    encode не берет (None), и оно отправляется в JSON. Изменение схемы —
+    это новый кодек (struct.v2) рядом со старым, пока его читают consumer'ы.
+    """
+
+    name = "struct.v1"
+    SCHEMAS = {
+        1: (
+            "booking.created",
+            {
+                "booking_id": INT64,
+                "restaurant_id": INT64,
+                "booking_datetime": DATETIME,
+                "guests_count": INT32,
+            },
+        ),
+        2: (
+            "booking.status_changed",
+            {
+                "booking_id": INT64,
+                "restaurant_id": INT64,
+                "booking_datetime": DATETIME,
+                "status": STATUS,
+            },
+        ),
+    }
+
+    def __init__(self):
+        self._by_type = {}
+        self._layouts = {}
+        for type_id, (event_type, fields) in self.SCHEMAS.items():
+            layout = struct.Struct("!B" + "".join(f[0] for f in fields.values()))
+            packers = [(name, pack) for name, (_, pack, _) in fields.items()]
+            self._by_type[event_type] = (type_id, fields.keys(), packers, layout)
+            self._layouts[type_id] = (event_type, fields, layout)
+
+    def encode(self, event: dict) -> Optional[bytes]:
+        schema = self._by_type.get(event.get("event_type"))
+        if schema is None or len(event) != 2:
+            return None
+        type_id, names, packers, layout = schema
+        data = event["data"]
+        if not isinstance(data, dict) or data.keys() != names:
+            return None
+        try:
+            return layout.pack(type_id, *[pack(data[name]) for name, pack in packers])
+        except (ValueError, TypeError, struct.error):
+            return None
+
+    def decode(self, value: bytes) -> dict:
+        try:
+            event_type, fields, layout = self._layouts[value[0]]
+            values = layout.unpack(value)[1:]
+        except (IndexError, KeyError, struct.error) as e:
+            raise ValueError(f"Malformed {self.name} event: {e!r}") from e
+        return {
+            "event_type": event_type,
+            "data": {
+                name: unpack(raw)
+                for (name, (_, _, unpack)), raw in zip(fields.items(), values)
+            },
+        }
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), StructCodecV1())}
+
+
+def encode_event(event: dict, codec_name: str) -> tuple[bytes, list[tuple[str, bytes]]]:
+    """Значение и заголовки сообщения; неподходящее для кодека событие — в JSON"""
+    codec = CODECS[codec_name]
+    value = codec.encode(event)
+    if value is None:
+        codec = CODECS[JsonCodec.name]
+        value = codec.encode(event)
+    return value, [(CODEC_HEADER, codec.name.encode("utf-8"))]
+
+
+def decode_event(value: bytes, headers=()) -> dict:
+    """Событие из значения сообщения по заголовку codec"""
+    name = JsonCodec.name
+    for key, raw in headers or ():
+        if key == CODEC_HEADER:
+            name = raw.decode("utf-8")
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown event codec: {name}")
+    return codec.decode(value)
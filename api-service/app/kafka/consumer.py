@@ -0,0 +1,97 @@
+"""Kafka Consumer событий изменения статуса бронирований"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+from aiokafka import AIOKafkaConsumer
+from aiokafka.errors import KafkaError
+from app.config import settings
+from app.kafka.codec import decode_event
+
+logger = logging.getLogger(__name__)
+
+# Обработчик события: получает data события booking.status_changed
+StatusHandler = Callable[[dict], None]
+
+
+class BookingStatusListener:
+    """
+    Подписка на события изменения статуса от Booking Service.
+
+    Один listener на worker: без consumer group, каждый worker получает
+    все события и раздает их зарегистрированным обработчикам в памяти.
+    """
+
+    def __init__(self):
+        self.consumer = None
+        self.topic = settings.kafka_status_topic
+        self._handlers: list[StatusHandler] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_handler(self, handler: StatusHandler):
+        """Регистрация обработчика событий статуса"""
+        self._handlers.append(handler)
+
+    def dispatch(self, event: dict):
+        """Передача события всем обработчикам"""
+        if event.get("event_type") != "booking.status_changed":
+            return
+
+        data = event.get("data", {})
+        for handler in self._handlers:
+            try:
+                handler(data)
+            except Exception as e:
+                logger.error(f"Status handler failed: {e}")
+
+    async def start(self):
+        """Подключение к Kafka и запуск фонового чтения"""
+        consumer = AIOKafkaConsumer(
+            self.topic,
+            bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
+            group_id=None,
+            auto_offset_reset="latest",
+        )
+        try:
+            await consumer.start()
+        except KafkaError as e:
+            await consumer.stop()
+            logger.error(f"Failed to start status listener: {e}")
+            raise
+
+        self.consumer = consumer
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Subscribed to topic: {self.topic}")
+
+    async def _run(self):
+        """Цикл чтения событий"""
+        try:
+            async for message in self.consumer:
+                # Сбой одного события не должен останавливать сброс кэшей
+                try:
+                    self.dispatch(decode_event(message.value, message.headers))
+                except Exception as e:
+                    logger.error(
+                        f"Status event {message.topic}[{message.partition}]"
+                        f"@{message.offset} skipped: {e}"
+                    )
+        except KafkaError as e:
+            logger.error(f"Status listener stopped: {e}")
+
+    async def stop(self):
+        """Остановка listener"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.consumer:
+            await self.consumer.stop()
+            self.consumer = None
+            logger.info("Status listener closed")
+
+
+# Singleton instance
+booking_status_listener = BookingStatusListener()
@@ -0,0 +1,186 @@
+"""Transactional outbox и фоновый relay событий в Kafka"""
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Optional
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.db.database import async_session_maker
+from app.kafka.producer import kafka_producer
+from app.models.outbox import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+UTC_NOW = func.timezone("utc", func.now())
+
+
+def add_outbox_event(db: AsyncSession, event_type: str, data: dict):
+    """
+    Добавление события в outbox.
+
+    Событие записывается в текущей транзакции и будет опубликовано
+    relay'ем только после ее коммита.
+    """
+    db.add(OutboxEvent(event_type=event_type, payload=data))
+
+
+def add_outbox_events(db: AsyncSession, event_type: str, items: list[dict]):
+    """Добавление пачки однотипных событий в outbox"""
+    db.add_all(OutboxEvent(event_type=event_type, payload=data) for data in items)
+
+
+class OutboxRelay:
+    """Публикация неотправленных событий outbox пачками"""
+
+    def __init__(self, session_maker=async_session_maker, producer=kafka_producer):
+        self.session_maker = session_maker
+        self.producer = producer
+        self.batch_size = settings.outbox_batch_size
+        self.poll_interval = settings.outbox_poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def relay_batch(self) -> int:
+        """
+        Публикация одной пачки событий.
+
+        Строки блокируются через FOR UPDATE SKIP LOCKED, поэтому несколько
+        relay'ев (по одному на worker) не публикуют одно событие дважды.
+        Подтверждения брокера ждутся не дольше outbox_ack_timeout: события
+        без подтверждения остаются неотправленными и уходят повторно
+        (at-least-once). Возвращает количество отправленных событий.
+        """
+        async with self.session_maker() as db:
+            async with db.begin():
+                result = await db.execute(
+                    select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload)
+                    .where(OutboxEvent.sent_at.is_(None))
+                    .order_by(OutboxEvent.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                rows = result.all()
+                if not rows:
+                    return 0
+
+                deliveries = [
+                    await self.producer.send_event(row.event_type, row.payload)
+                    for row in rows
+                ]
+                await asyncio.wait(deliveries, timeout=settings.outbox_ack_timeout)
+
+                sent_ids = [
+                    row.id
+                    for row, delivery in zip(rows, deliveries)
+                    if delivery.done()
+                    and not delivery.cancelled()
+                    and delivery.exception() is None
+                ]
+                if sent_ids:
+                    await db.execute(
+                        update(OutboxEvent)
+                        .where(OutboxEvent.id.in_(sent_ids))
+                        .values(sent_at=UTC_NOW)
+                    )
+
+        if len(sent_ids) < len(rows):
+            logger.warning(
+                f"Outbox: {len(rows) - len(sent_ids)} events failed, will retry"
+            )
+        return len(sent_ids)
+
+    def notify(self):
+        """Разбудить relay после коммита новых событий"""
+        self._wakeup.set()
+
+    async def run(self):
+        """Фоновый цикл relay"""
+        while True:
+            try:
+                sent = await self.relay_batch()
+            except Exception as e:
+                logger.error(f"Outbox relay error: {e}")
+                sent = 0
+
+            # Полная пачка — вероятно, есть еще события, не ждем
+            if sent < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self):
+        """Запуск relay в фоне"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+            logger.info("Outbox relay started")
+
+    async def stop(self):
+        """Остановка relay"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Outbox relay stopped")
+
+
+async def purge_sent_events(session_maker, batch_size: int) -> int:
+    """Удаление пачки событий, отправленных раньше outbox_retention секунд назад"""
+    async with session_maker() as db:
+        sent = (
+            select(OutboxEvent.id)
+            .where(
+                OutboxEvent.sent_at
+                < UTC_NOW - timedelta(seconds=settings.outbox_retention)
+            )
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(sent)))
+        await db.commit()
+        return result.rowcount
+
+
+class OutboxPurger:
+    """Фоновое удаление отправленных событий outbox"""
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        batch_size = settings.outbox_purge_batch_size
+        while True:
+            try:
+                # Полная пачка — вероятно, есть еще отправленные события
+                purged = batch_size
+                while purged == batch_size:
+                    purged = await purge_sent_events(self.session_maker, batch_size)
+            except Exception as e:
+                logger.error(f"Outbox purge error: {e}")
+            await asyncio.sleep(settings.outbox_purge_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instances
+outbox_relay = OutboxRelay()
+outbox_purger = OutboxPurger()
@@ -1,56 +1,184 @@
 """Kafka Producer для публикации событий"""
 
-import json
+import asyncio
 import logging
-from kafka import KafkaProducer as KafkaClient
-from kafka.errors import KafkaError
+import time
+from functools import partial
+from typing import Callable, Optional
+from aiokafka import AIOKafkaProducer
+from aiokafka.errors import KafkaError, KafkaConnectionError
 from app.config import settings
+from app.kafka.codec import encode_event
 
 logger = logging.getLogger(__name__)
 
+# Callback доставки: (event, error, latency_seconds); error is None при успехе
+DeliveryCallback = Callable[[dict, Optional[Exception], float], None]
+
+
+def _serialize_key(key) -> Optional[bytes]:
+    """
+    Ключ сообщения — restaurant_id.
+
+    События одного ресторана попадают в одну партицию и обрабатываются
+    одним consumer'ом группы в порядке публикации.
+    """
+    return None if key is None else str(key).encode("utf-8")
+
 
 class KafkaProducer:
-    """Обертка для Kafka Producer"""
+    """
+    Асинхронный producer с ограниченным буфером и пакетной отправкой.
+
+    send_event кладет событие в in-process очередь и сразу возвращает
+    future доставки. Фоновая задача забирает события пачками (по размеру
+    или по истечении linger) и передает их в AIOKafkaProducer, не дожидаясь
+    подтверждения брокера. Запрос ждет только когда буфер заполнен.
+    """
 
     def __init__(self):
         self.producer = None
         self.topic = settings.kafka_topic
+        self._queue: Optional[asyncio.Queue] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._callbacks: list[DeliveryCallback] = []
+        self.stats = {"enqueued": 0, "sent": 0, "failed": 0, "batches": 0}
 
-    def connect(self):
-        """Подключение к Kafka"""
+    async def connect(self):
+        """Подключение к Kafka и запуск фоновой отправки"""
+        producer = AIOKafkaProducer(
+            bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
+            key_serializer=_serialize_key,
+            linger_ms=settings.kafka_linger_ms,
+            max_batch_size=settings.kafka_max_batch_bytes,
+            compression_type=settings.kafka_compression_type,
+        )
         try:
-            self.producer = KafkaClient(
-                bootstrap_servers=settings.kafka_bootstrap_servers.split(","),
-                value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-                retries=3,
-                max_in_flight_requests_per_connection=1,
-            )
-            logger.info(f"Connected to Kafka: {settings.kafka_bootstrap_servers}")
+            await producer.start()
         except KafkaError as e:
+            await producer.stop()
             logger.error(f"Failed to connect to Kafka: {e}")
             raise
 
-    def send_event(self, event_type: str, data: dict):
-        """Отправка события в Kafka"""
+        self.producer = producer
+        self._queue = asyncio.Queue(maxsize=settings.kafka_buffer_size)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Connected to Kafka: {settings.kafka_bootstrap_servers}")
+
+    def add_delivery_callback(self, callback: DeliveryCallback):
+        """Регистрация callback'а, вызываемого на каждую доставку/ошибку"""
+        self._callbacks.append(callback)
+
+    async def send_event(self, event_type: str, data: dict) -> asyncio.Future:
+        """
+        Постановка события в очередь на отправку.
+
+        Возвращает future, который завершится после подтверждения брокера
+        (или с исключением при ошибке доставки).
+        """
         if not self.producer:
-            self.connect()
+            await self.connect()
 
         event = {"event_type": event_type, "data": data}
+        delivery = asyncio.get_running_loop().create_future()
+        await self._queue.put((event, delivery, time.perf_counter()))
+        self.stats["enqueued"] += 1
+        return delivery
 
-        try:
-            future = self.producer.send(self.topic, event)
-            future.get(timeout=10)
-            logger.info(
-                f"Event sent: {event_type}, booking_id: {data.get('booking_id')}"
-            )
-        except KafkaError as e:
-            logger.error(f"Failed to send event: {e}")
-            raise
+    async def _flush_loop(self):
+        """Сбор событий из очереди в пачки по размеру и linger"""
+        loop = asyncio.get_running_loop()
+        linger = settings.kafka_linger_ms / 1000
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + linger
+            while len(batch) < settings.kafka_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._send_batch(batch)
+
+    async def _send_batch(self, batch: list):
+        """Передача пачки в producer без ожидания подтверждений"""
+        self.stats["batches"] += 1
+        for event, delivery, started in batch:
+            try:
+                value, headers = encode_event(event, settings.kafka_event_codec)
+                ack = await self.producer.send(
+                    self.topic,
+                    value,
+                    key=event["data"].get("restaurant_id"),
+                    headers=headers,
+                )
+                ack.add_done_callback(partial(self._on_ack, event, delivery, started))
+            except Exception as e:
+                # Ошибка одного события (в том числе кодирования) не должна
+                # останавливать фоновую отправку
+                self._on_delivery(event, delivery, started, error=e)
+            finally:
+                self._queue.task_done()
+
+    def _on_ack(self, event: dict, delivery: asyncio.Future, started: float, ack):
+        """Обработка подтверждения брокера"""
+        if ack.cancelled():
+            error = KafkaConnectionError("Delivery cancelled")
+        else:
+            error = ack.exception()
+        self._on_delivery(event, delivery, started, error=error)
+
+    def _on_delivery(
+        self,
+        event: dict,
+        delivery: asyncio.Future,
+        started: float,
+        error: Optional[Exception] = None,
+    ):
+        """Учет результата доставки и вызов callback'ов"""
+        latency = time.perf_counter() - started
+        if error is None:
+            self.stats["sent"] += 1
+            if not delivery.done():
+                delivery.set_result(None)
+        else:
+            self.stats["failed"] += 1
+            logger.error(f"Failed to send event {event['event_type']}: {error}")
+            if not delivery.done():
+                delivery.set_exception(error)
+                # Future может никто не ждать: помечаем исключение как полученное
+                delivery.exception()
+
+        for callback in self._callbacks:
+            try:
+                callback(event, error, latency)
+            except Exception as e:
+                logger.error(f"Delivery callback failed: {e}")
 
-    def close(self):
-        """Закрытие соединения"""
+    async def close(self):
+        """Отправка оставшихся событий и закрытие соединения"""
+        if self._flush_task:
+            # Завершившаяся задача очередь уже не разберет: join ждал бы вечно
+            if not self._flush_task.done():
+                await self._queue.join()
+            self._flush_task.cancel()
+            self._flush_task = None
+            while not self._queue.empty():
+                event, delivery, started = self._queue.get_nowait()
+                self._on_delivery(
+                    event,
+                    delivery,
+                    started,
+                    error=KafkaConnectionError("Producer closed"),
+                )
         if self.producer:
-            self.producer.close()
+            await self.producer.stop()
+            self.producer = None
             logger.info("Kafka producer closed")
 
 
@@ -3,10 +3,20 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.bookings import router as bookings_router
+from fastapi.responses import ORJSONResponse
+from app.api.bookings import invalidate_booking_cache, router as bookings_router
+from app.api.restaurants import router as restaurants_router
+from app.availability import availability_cache
+from app.idempotency import idempotency_key_purger
 from app.kafka.producer import kafka_producer
+from app.kafka.outbox import outbox_purger, outbox_relay
+from app.kafka.consumer import booking_status_listener
+from app.partitions import partition_maintainer
 from app.db.database import engine
+from app.db.pool import pool_stats
+from app.metrics import MetricsMiddleware, metrics_response, observe_kafka_delivery
 from app.models import Booking, Restaurant
+from app.waiters import booking_waiters
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -18,18 +28,40 @@ async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения"""
     # Startup
     logger.info("Starting up API service...")
+    kafka_producer.add_delivery_callback(observe_kafka_delivery)
     try:
-        kafka_producer.connect()
+        await kafka_producer.connect()
     except Exception as e:
         logger.warning(
             f"Kafka connection failed: {e}. Service will continue without Kafka."
         )
+    outbox_relay.start()
+    outbox_purger.start()
+    partition_maintainer.start()
+    idempotency_key_purger.start()
+
+    # События смены статуса от Booking Service сбрасывают кэш бронирований
+    # и рассчитанную доступность ресторанов, будят запросы GET /bookings/{id}/wait
+    booking_status_listener.add_handler(invalidate_booking_cache)
+    booking_status_listener.add_handler(availability_cache.invalidate)
+    booking_status_listener.add_handler(booking_waiters.notify)
+    try:
+        await booking_status_listener.start()
+    except Exception as e:
+        logger.warning(
+            f"Status listener failed: {e}. Booking cache will rely on TTL only."
+        )
 
     yield
 
     # Shutdown
     logger.info("Shutting down API service...")
-    kafka_producer.close()
+    await outbox_relay.stop()
+    await outbox_purger.stop()
+    await partition_maintainer.stop()
+    await idempotency_key_purger.stop()
+    await booking_status_listener.stop()
+    await kafka_producer.close()
     await engine.dispose()
 
 
@@ -38,6 +70,7 @@ app = FastAPI(
     description="API для системы бронирования столиков в ресторанах",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
 )
@@ -51,8 +84,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Латентность запросов по маршрутам для /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Подключаем роутеры
 app.include_router(bookings_router)
+app.include_router(restaurants_router)
 
 
 @app.get("/", tags=["Health"])
@@ -69,3 +106,15 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@app.get("/health/db-pool", tags=["Health"])
+async def db_pool_health():
+    """Состояние пула соединений БД текущего worker'а"""
+    return pool_stats(engine)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return metrics_response()
@@ -0,0 +1,125 @@
+"""Prometheus-метрики API Service"""
+
+import time
+from typing import Optional
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from app.db.database import engine
+from app.db.pool import pool_stats
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Латентность HTTP-запросов по маршрутам",
+    ["method", "route", "status"],
+)
+SQL_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "Время выполнения SQL-запросов по типу операции",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+KAFKA_SEND_LATENCY = Histogram(
+    "kafka_send_duration_seconds",
+    "Время от постановки события в буфер до подтверждения брокера",
+    ["event_type"],
+)
+KAFKA_SEND_FAILURES = Counter(
+    "kafka_send_failures_total",
+    "Ошибки доставки событий в Kafka",
+    ["event_type"],
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware с гистограммой латентности по шаблону маршрута.
+
+    Метка route — шаблон пути (/bookings/{booking_id}), а не сам путь,
+    чтобы число временных рядов не росло с количеством бронирований.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code),
+            ).observe(time.perf_counter() - started)
+
+
+def instrument_engine(sync_engine):
+    """Замер времени SQL-запросов через события engine"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, many):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        SQL_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def observe_kafka_delivery(event: dict, error: Optional[Exception], latency: float):
+    """Callback доставки для KafkaProducer"""
+    event_type = event["event_type"]
+    if error is None:
+        KAFKA_SEND_LATENCY.labels(event_type).observe(latency)
+    else:
+        KAFKA_SEND_FAILURES.labels(event_type).inc()
+
+
+class PoolStatsCollector:
+    """Состояние пула соединений, снимаемое в момент scrape"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        for key, value in pool_stats(self.engine).items():
+            yield GaugeMetricFamily(
+                f"db_pool_{key}", f"Пул соединений БД: {key}", value=value
+            )
+
+
+def metrics_response() -> Response:
+    """Ответ в текстовом формате Prometheus"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+instrument_engine(engine.sync_engine)
+REGISTRY.register(PoolStatsCollector(engine))
@@ -1,4 +1,14 @@
 from app.models.booking import Booking, BookingStatus
+from app.models.idempotency import IdempotencyKey
+from app.models.outbox import OutboxEvent
 from app.models.restaurant import Restaurant
+from app.models.restaurant_table import RestaurantTable
 
-__all__ = ["Booking", "BookingStatus", "Restaurant"]
+__all__ = [
+    "Booking",
+    "BookingStatus",
+    "IdempotencyKey",
+    "OutboxEvent",
+    "Restaurant",
+    "RestaurantTable",
+]
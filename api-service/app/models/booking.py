@@ -1,11 +1,22 @@
 """Модель бронирования"""
 
-from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    Enum as SQLEnum,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
+UTC_NOW = text("timezone('utc', now())")
+
 
 class BookingStatus(str, Enum):
     """Статусы бронирования"""
@@ -17,7 +28,13 @@ class BookingStatus(str, Enum):
 
 
 class Booking(Base):
-    """Модель бронирования столика"""
+    """
+    Модель бронирования столика.
+
+    В БД таблица секционирована по месяцам booking_datetime (миграция 008,
+    первичный ключ (id, booking_datetime)); модель описывает ее как обычную,
+    поэтому create_all (тесты, seed) создает таблицу без секций.
+    """
 
     __tablename__ = "bookings"
 
@@ -28,10 +45,39 @@ class Booking(Base):
     status = Column(
         SQLEnum(BookingStatus), default=BookingStatus.CREATED, nullable=False
     )
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Стол и длительность визита назначает Booking Service при подтверждении
+    table_id = Column(Integer, ForeignKey("restaurant_tables.id"), nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+    # Время проставляет БД (UTC), чтобы INSERT ... RETURNING сразу отдавал его
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
     updated_at = Column(
-        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+        DateTime,
+        server_default=UTC_NOW,
+        onupdate=func.timezone("utc", func.now()),
+        nullable=False,
     )
 
+    __table_args__ = (
+        # Keyset-пагинация списка бронирований: (booking_datetime, id)
+        Index(
+            "ix_bookings_restaurant_datetime", "restaurant_id", "booking_datetime", "id"
+        ),
+        Index("ix_bookings_status_datetime", "status", "booking_datetime", "id"),
+        Index("ix_bookings_datetime", "booking_datetime", "id"),
+        # Не больше одного подтвержденного бронирования на слот ресторана
+        # без столов; пересечения по столам исключает ex_bookings_table_overlap
+        # (миграция 006, требует btree_gist)
+        Index(
+            "uq_bookings_confirmed_slot",
+            "restaurant_id",
+            "booking_datetime",
+            unique=True,
+            postgresql_where=text("status = 'CONFIRMED' AND table_id IS NULL"),
+        ),
+    )
+
+    # Серверные значения (updated_at) забираются через RETURNING того же UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
     # Связь с рестораном
     restaurant = relationship("Restaurant", back_populates="bookings")
@@ -0,0 +1,25 @@
+"""Модель ключей идемпотентности"""
+
+from sqlalchemy import Column, DateTime, Index, Integer, LargeBinary, String, text
+from app.db.database import Base
+
+UTC_NOW = text("timezone('utc', now())")
+
+
+class IdempotencyKey(Base):
+    """Ключ Idempotency-Key запроса POST /bookings и сохраненный ответ на него"""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    # Отпечаток тела запроса: тот же ключ с другим телом — ошибка клиента
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Очистка истекших ключей
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
@@ -0,0 +1,23 @@
+"""Модель outbox для транзакционной публикации событий"""
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, String, text
+from app.db.database import Base
+
+UTC_NOW = text("timezone('utc', now())")
+
+
+class OutboxEvent(Base):
+    """Событие, ожидающее публикации в Kafka"""
+
+    __tablename__ = "outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Relay читает только неотправленные события — индекс остается маленьким
+        Index("ix_outbox_pending", "id", postgresql_where=sent_at.is_(None)),
+    )
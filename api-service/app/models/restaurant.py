@@ -1,6 +1,6 @@
 """Модель ресторана"""
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, Integer, String, func, text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -14,6 +14,20 @@ class Restaurant(Base):
     name = Column(String, nullable=False)
     address = Column(String, nullable=False)
     description = Column(String, nullable=True)
+    # Сколько длится визит: на это время бронирование занимает стол
+    booking_duration_minutes = Column(
+        Integer, default=120, server_default=text("120"), nullable=False
+    )
+    # Версия строки для снимка ресторанов в памяти API Service; при правке
+    # напрямую в БД ее обновляет триггер (миграция 007)
+    updated_at = Column(
+        DateTime,
+        server_default=text("timezone('utc', now())"),
+        onupdate=func.timezone("utc", func.now()),
+        nullable=False,
+    )
 
     # Связь с бронированиями
     bookings = relationship("Booking", back_populates="restaurant")
+    # Без столов ресторан работает по слотам: одно бронирование на время
+    tables = relationship("RestaurantTable", back_populates="restaurant")
@@ -0,0 +1,24 @@
+"""Модель стола ресторана"""
+
+from sqlalchemy import CheckConstraint, Column, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+from app.db.database import Base
+
+
+class RestaurantTable(Base):
+    """Стол ресторана; бронирование занимает один стол на время визита"""
+
+    __tablename__ = "restaurant_tables"
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(
+        Integer, ForeignKey("restaurants.id"), nullable=False, index=True
+    )
+    number = Column(String, nullable=False)
+    capacity = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("capacity > 0", name="ck_restaurant_tables_capacity"),
+    )
+
+    restaurant = relationship("Restaurant", back_populates="tables")
@@ -0,0 +1,171 @@
+"""
+Секции таблицы bookings (миграция 008): создание будущих месяцев
+и архивирование прошлых.
+
+Архивирование запускается по расписанию (cron) из каталога api-service:
+    python -m app.partitions archive --keep-months 12 --output-dir archive
+"""
+
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+import asyncpg
+from sqlalchemy import text
+from app.config import settings
+from app.db.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r"^bookings_p(\d{4})_(\d{2})$")
+
+
+async def ensure_partitions(session_maker, months_ahead: int) -> int:
+    """
+    Создание секций на months_ahead месяцев вперед.
+
+    Возвращает число созданных секций; 0, если схема без секций
+    (таблицы созданы через create_all, а не миграциями).
+    """
+    async with session_maker() as db:
+        if await db.scalar(text("SELECT to_regproc('bookings_ensure_partitions')")):
+            created = await db.scalar(
+                text("SELECT bookings_ensure_partitions(:months)"),
+                {"months": months_ahead},
+            )
+            await db.commit()
+            return created
+    return 0
+
+
+class PartitionMaintainer:
+    """
+    Фоновое создание будущих секций bookings.
+
+    Бронирования месяца без секции попадают в секцию по умолчанию,
+    поэтому пропущенный запуск не ломает запись, а только увеличивает
+    секцию по умолчанию до следующего.
+    """
+
+    def __init__(self, session_maker=async_session_maker):
+        self.session_maker = session_maker
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        while True:
+            try:
+                created = await ensure_partitions(
+                    self.session_maker, settings.booking_partitions_ahead_months
+                )
+                if created:
+                    logger.info(f"Created {created} booking partitions")
+            except Exception as e:
+                logger.error(f"Booking partitions maintenance error: {e}")
+            await asyncio.sleep(settings.booking_partitions_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Singleton instance
+partition_maintainer = PartitionMaintainer()
+
+
+def archive_cutoff(today: date, keep_months: int) -> date:
+    """Первый месяц, который остается в bookings"""
+    months = today.year * 12 + today.month - 1 - keep_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def export_table(conn: asyncpg.Connection, table: str, path: str):
+    """Выгрузка таблицы в CSV с заголовком, сжатый gzip; файл появляется целиком"""
+    partial = path + ".partial"
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(os.path.basename(path), "wb", fileobj=raw) as out:
+            await conn.copy_from_table(table, output=out, format="csv", header=True)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+
+async def archive_partitions(
+    conn: asyncpg.Connection, keep_months: int, output_dir: str
+) -> list[str]:
+    """
+    Отключение секций старше keep_months месяцев, выгрузка в output_dir
+    и удаление. Возвращает пути архивов.
+
+    Секция удаляется только после записи архива. Отключенные, но не
+    удаленные секции (прерванный запуск) архивируются следующим запуском.
+    DETACH PARTITION без CONCURRENTLY (его не допускает секция
+    по умолчанию) ненадолго блокирует bookings, поэтому ожидание
+    блокировки ограничено lock_timeout: при конфликте запуск прерывается.
+    """
+    cutoff = archive_cutoff(datetime.now(timezone.utc).date(), keep_months)
+    rows = await conn.fetch(
+        "SELECT c.relname, i.inhparent IS NOT NULL AS attached "
+        "FROM pg_class c LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+        "WHERE c.relkind = 'r' AND c.relnamespace = current_schema()::regnamespace "
+        "AND c.relname LIKE 'bookings\\_p%' ORDER BY c.relname"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    await conn.execute("SET lock_timeout = '5s'")
+
+    archived = []
+    for row in rows:
+        match = PARTITION_NAME.match(row["relname"])
+        if not match or date(int(match[1]), int(match[2]), 1) >= cutoff:
+            continue
+        table = row["relname"]
+        if row["attached"]:
+            await conn.execute(f'ALTER TABLE bookings DETACH PARTITION "{table}"')
+        path = os.path.join(output_dir, f"{table}.csv.gz")
+        await export_table(conn, table, path)
+        await conn.execute(f'DROP TABLE "{table}"')
+        logger.info(f"Archived {table} to {path}")
+        archived.append(path)
+    return archived
+
+
+async def main(args):
+    if args.command == "ensure":
+        created = await ensure_partitions(async_session_maker, args.months_ahead)
+        print(f"Created partitions: {created}")
+        return
+
+    conn = await asyncpg.connect(settings.database_url)
+    try:
+        archived = await archive_partitions(conn, args.keep_months, args.output_dir)
+    finally:
+        await conn.close()
+    print(f"Archived partitions: {len(archived)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Обслуживание секций bookings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="Создать будущие секции")
+    ensure.add_argument(
+        "--months-ahead", type=int, default=settings.booking_partitions_ahead_months
+    )
+    archive = commands.add_parser("archive", help="Архивировать прошлые секции")
+    archive.add_argument(
+        "--keep-months", type=int, default=settings.booking_archive_keep_months
+    )
+    archive.add_argument("--output-dir", default=settings.booking_archive_dir)
+    asyncio.run(main(parser.parse_args()))
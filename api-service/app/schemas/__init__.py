@@ -1,4 +1,20 @@
-from app.schemas.booking import BookingCreate, BookingResponse
-from app.schemas.restaurant import RestaurantResponse
+from app.schemas.booking import (
+    BookingBatchCreate,
+    BookingBatchItemResult,
+    BookingBatchResponse,
+    BookingCreate,
+    BookingPage,
+    BookingResponse,
+)
+from app.schemas.restaurant import RestaurantAvailability, RestaurantResponse
 
-__all__ = ["BookingCreate", "BookingResponse", "RestaurantResponse"]
+__all__ = [
+    "BookingBatchCreate",
+    "BookingBatchItemResult",
+    "BookingBatchResponse",
+    "BookingCreate",
+    "BookingPage",
+    "BookingResponse",
+    "RestaurantAvailability",
+    "RestaurantResponse",
+]
@@ -1,16 +1,33 @@
 """Pydantic схемы для бронирований"""
 
-from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
+from datetime import datetime, timezone
+from typing import Any
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from app.config import settings
 from app.models.booking import BookingStatus
 
+# Верхняя граница integer в Postgres: большее значение отклонил бы INSERT
+INT32_MAX = 2**31 - 1
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Время с часовым поясом приводится к UTC: в БД оно хранится без пояса"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 class BookingCreate(BaseModel):
     """Схема создания бронирования"""
 
-    restaurant_id: int = Field(..., description="ID ресторана", gt=0)
+    restaurant_id: int = Field(..., description="ID ресторана", gt=0, le=INT32_MAX)
     booking_datetime: datetime = Field(..., description="Дата и время бронирования")
-    guests_count: int = Field(..., description="Количество гостей", gt=0)
+    guests_count: int = Field(..., description="Количество гостей", gt=0, le=INT32_MAX)
+
+    @field_validator("booking_datetime")
+    @classmethod
+    def to_naive_utc(cls, value: datetime) -> datetime:
+        return naive_utc(value)
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -31,7 +48,46 @@ class BookingResponse(BaseModel):
     booking_datetime: datetime
     guests_count: int
     status: BookingStatus
+    table_id: int | None = Field(None, description="Назначенный стол")
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class BookingPage(BaseModel):
+    """Страница списка бронирований"""
+
+    items: list[BookingResponse]
+    next_cursor: str | None = Field(
+        None, description="Курсор следующей страницы (параметр after)"
+    )
+
+
+class BookingBatchCreate(BaseModel):
+    """Схема пакетного создания бронирований"""
+
+    # Элементы валидируются по BookingCreate по отдельности, чтобы одна
+    # некорректная запись не отклоняла всю пачку
+    items: list[dict[str, Any]] = Field(
+        ...,
+        description="Бронирования в формате BookingCreate",
+        min_length=1,
+        max_length=settings.booking_batch_max_size,
+    )
+
+
+class BookingBatchItemResult(BaseModel):
+    """Результат обработки одного элемента пачки"""
+
+    index: int
+    booking: BookingResponse | None = None
+    error: str | None = None
+
+
+class BookingBatchResponse(BaseModel):
+    """Схема ответа на пакетное создание бронирований"""
+
+    created: int
+    failed: int
+    results: list[BookingBatchItemResult]
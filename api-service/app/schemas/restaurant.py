@@ -1,6 +1,7 @@
 """Pydantic схемы для ресторанов"""
 
-from pydantic import BaseModel, ConfigDict
+from datetime import date, datetime
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class RestaurantResponse(BaseModel):
@@ -10,5 +11,19 @@ class RestaurantResponse(BaseModel):
     name: str
     address: str
     description: str | None = None
+    booking_duration_minutes: int
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class RestaurantAvailability(BaseModel):
+    """Свободные слоты ресторана на день"""
+
+    restaurant_id: int
+    date: date
+    guests: int
+    slot_minutes: int = Field(..., description="Шаг сетки слотов")
+    duration_minutes: int = Field(..., description="Длительность визита")
+    free_slots: list[datetime] = Field(
+        ..., description="Начала слотов, в которые есть свободный стол"
+    )
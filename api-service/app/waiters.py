@@ -0,0 +1,44 @@
+"""Ожидание смены статуса бронирований в памяти worker'а"""
+
+import asyncio
+from typing import Hashable
+
+
+class StatusWaiters:
+    """
+    Запросы, ждущие смены статуса бронирований.
+
+    Событие booking.status_changed приходит из одного на worker
+    BookingStatusListener и будит всех, кто ждет это бронирование: число
+    ожидающих клиентов не добавляет ни соединений с БД, ни подписок на Kafka.
+    Не потокобезопасен: рассчитан на использование из одного event loop.
+    """
+
+    def __init__(self):
+        self._waiters: dict[Hashable, set[asyncio.Event]] = {}
+
+    def subscribe(self, booking_id: Hashable) -> asyncio.Event:
+        """Регистрация ожидающего; событие взводится при смене статуса"""
+        signal = asyncio.Event()
+        self._waiters.setdefault(booking_id, set()).add(signal)
+        return signal
+
+    def unsubscribe(self, booking_id: Hashable, signal: asyncio.Event):
+        waiters = self._waiters.get(booking_id)
+        if waiters is None:
+            return
+        waiters.discard(signal)
+        if not waiters:
+            del self._waiters[booking_id]
+
+    def notify(self, data: dict):
+        """Обработчик события booking.status_changed"""
+        for signal in self._waiters.get(data.get("booking_id"), ()):
+            signal.set()
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+
+# Singleton instance
+booking_waiters = StatusWaiters()
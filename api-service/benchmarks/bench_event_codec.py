@@ -0,0 +1,88 @@
+"""
+Бенчмарк: размер и время (де)сериализации событий Kafka по кодекам.
+
+Сравнивает прежний путь (json.dumps / json.loads в serializer'ах
+aiokafka) с кодеками app.kafka.codec на событиях booking.created
+и booking.status_changed. БД и Kafka не нужны.
+
+Запуск из каталога api-service:
+    python -m benchmarks.bench_event_codec --events 100000 --rounds 5
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from app.kafka.codec import decode_event, encode_event
+
+
+def make_events(count: int) -> list[dict]:
+    """События в том виде, в каком их публикуют сервисы"""
+    base = datetime(2024, 6, 1, 12, 0)
+    events = []
+    for i in range(count):
+        data = {
+            "booking_id": 1_000_000 + i,
+            "restaurant_id": i % 500 + 1,
+            "booking_datetime": (base + timedelta(minutes=15 * i)).isoformat(),
+        }
+        if i % 2:
+            events.append(
+                {
+                    "event_type": "booking.status_changed",
+                    "data": {**data, "status": "CONFIRMED"},
+                }
+            )
+        else:
+            events.append(
+                {"event_type": "booking.created", "data": {**data, "guests_count": 4}}
+            )
+    return events
+
+
+def run_path(name: str, encode, decode, events: list[dict], rounds: int):
+    """Прогон одного варианта; время — лучший из rounds прогонов"""
+    encode_time = decode_time = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        messages = [encode(event) for event in events]
+        encoded = time.perf_counter()
+        decoded = [decode(message) for message in messages]
+        finished = time.perf_counter()
+        encode_time = min(encode_time, encoded - started)
+        decode_time = min(decode_time, finished - encoded)
+
+    assert decoded == events
+    size = sum(len(value) for value, _ in messages) / len(events)
+    print(
+        f"{name:<10} bytes/event={size:.1f} "
+        f"encode={encode_time / len(events) * 1e6:.2f} us "
+        f"decode={decode_time / len(events) * 1e6:.2f} us"
+    )
+
+
+def main(count: int, rounds: int):
+    events = make_events(count)
+    run_path(
+        "legacy",
+        lambda e: (json.dumps(e).encode("utf-8"), None),
+        lambda m: json.loads(m[0].decode("utf-8")),
+        events,
+        rounds,
+    )
+    for codec in ("json", "struct.v1"):
+        run_path(
+            codec,
+            lambda e, codec=codec: encode_event(e, codec),
+            lambda m: decode_event(*m),
+            events,
+            rounds,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    main(args.events, args.rounds)
@@ -0,0 +1,106 @@
+"""
+Бенчмарк: CPU на сериализацию ответа с бронированиями.
+
+Сравнивает прежний путь (ORM-объект -> проверка response_model
+BookingResponse через from_attributes -> JSONResponse) с текущим
+(строка BOOKING_COLUMNS -> booking_payload -> ORJSONResponse) для ответа
+с одним бронированием (POST /bookings, GET /bookings/{id}) и страницы
+GET /bookings. БД не нужна.
+
+Запуск из каталога api-service:
+    python -m benchmarks.bench_response_serialization --requests 20000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.api.bookings import BOOKING_FIELDS, booking_payload
+from app.config import settings
+from app.models import Booking, BookingStatus
+from app.schemas.booking import BookingPage, BookingResponse
+
+
+def make_rows(count: int) -> list[tuple]:
+    """Строки в порядке BOOKING_COLUMNS, как их отдает SELECT"""
+    base = datetime(2024, 6, 1, 12, 0, 0, 123456)
+    return [
+        (
+            1_000_000 + i,
+            i % 500 + 1,
+            base + timedelta(minutes=15 * i),
+            4,
+            BookingStatus.CONFIRMED,
+            i % 20 + 1,
+            base,
+            base + timedelta(seconds=1),
+        )
+        for i in range(count)
+    ]
+
+
+def to_orm(row: tuple) -> Booking:
+    return Booking(**dict(zip(BOOKING_FIELDS, row)))
+
+
+async def run_path(name: str, render, items: list, requests: int, rounds: int):
+    """Прогон одного варианта; время — лучший из rounds прогонов"""
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for i in range(requests):
+            body = await render(items[i % len(items)])
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<14} {best / requests * 1e6:8.2f} us/request  {len(body)} bytes")
+    return body
+
+
+async def main(requests: int, rounds: int):
+    page_size = settings.bookings_page_size
+    rows = make_rows(page_size)
+    objects = [to_orm(row) for row in rows]
+    booking_field = create_response_field("Response", BookingResponse)
+    page_field = create_response_field("Response", BookingPage)
+
+    async def legacy_booking(booking):
+        content = await serialize_response(
+            field=booking_field, response_content=booking
+        )
+        return JSONResponse(content).body
+
+    async def fast_booking(row):
+        return ORJSONResponse(booking_payload(row)).body
+
+    async def legacy_page(bookings):
+        content = await serialize_response(
+            field=page_field,
+            response_content=BookingPage(items=bookings, next_cursor=None),
+        )
+        return JSONResponse(content).body
+
+    async def fast_page(rows):
+        payload = {"items": [booking_payload(row) for row in rows], "next_cursor": None}
+        return ORJSONResponse(payload).body
+
+    before = await run_path("booking before", legacy_booking, objects, requests, rounds)
+    after = await run_path("booking after", fast_booking, rows, requests, rounds)
+    assert json.loads(before) == json.loads(after)
+
+    page_requests = max(requests // page_size, 1)
+    before = await run_path(
+        "page before", legacy_page, [objects], page_requests, rounds
+    )
+    after = await run_path("page after", fast_page, [rows], page_requests, rounds)
+    assert json.loads(before) == json.loads(after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rounds))
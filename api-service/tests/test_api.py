@@ -1,17 +1,35 @@
 """Интеграционные тесты API"""
 
+import asyncio
+import base64
 import pytest
 import pytest_asyncio
 from datetime import datetime, timedelta
 from httpx import AsyncClient
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
+from app.api.bookings import invalidate_booking_cache
+from app.availability import availability_cache
+from app.cache import booking_cache, idempotency_cache, restaurant_snapshot
+from app.config import settings
 from app.main import app
 from app.db.database import get_db, Base
-from app.models import Restaurant, Booking, BookingStatus
+from app.idempotency import purge_expired_keys
+from app.kafka.outbox import OutboxRelay, purge_sent_events
+from app.models import (
+    Restaurant,
+    RestaurantTable,
+    Booking,
+    BookingStatus,
+    IdempotencyKey,
+    OutboxEvent,
+)
+from app.schemas import BookingResponse
+from app.waiters import booking_waiters
 
 # Тестовая база данных
 TEST_DATABASE_URL = (
@@ -55,6 +73,10 @@ async def override_db(test_session_maker):
                 await session.close()
 
     app.dependency_overrides[get_db] = _override_get_db
+    booking_cache.clear()
+    restaurant_snapshot.clear()
+    availability_cache.clear()
+    idempotency_cache.clear()
     yield
     app.dependency_overrides.clear()
 
@@ -95,6 +117,153 @@ async def test_create_booking(test_restaurant):
         assert data["status"] == "CREATED"
 
 
+@pytest.mark.asyncio
+async def test_create_booking_unknown_restaurant(test_restaurant, test_session_maker):
+    """Тест: неизвестный ресторан отклоняется до записи в БД"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/bookings",
+            json={
+                "restaurant_id": test_restaurant.id + 1,
+                "booking_datetime": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+                "guests_count": 2,
+            },
+        )
+
+    assert response.status_code == 404
+    async with test_session_maker() as session:
+        result = await session.execute(select(Booking))
+        assert result.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_restaurants_snapshot(test_restaurant, test_session_maker, monkeypatch):
+    """Тест: рестораны отдаются из снимка с ETag и обновляются по версии таблицы"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/restaurants")
+        assert response.status_code == 200
+        assert [r["id"] for r in response.json()] == [test_restaurant.id]
+        etag = response.headers["ETag"]
+
+        response = await client.get("/restaurants", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        response = await client.get(f"/restaurants/{test_restaurant.id}")
+        assert response.json()["name"] == "Тестовый ресторан"
+        restaurant_etag = response.headers["ETag"]
+        response = await client.get(f"/restaurants/{test_restaurant.id + 1}")
+        assert response.status_code == 404
+
+        async with test_session_maker() as session:
+            restaurant = await session.get(Restaurant, test_restaurant.id)
+            restaurant.name = "Новое название"
+            await session.commit()
+
+        # Версия таблицы сверяется не чаще restaurant_snapshot_interval
+        response = await client.get(f"/restaurants/{test_restaurant.id}")
+        assert response.json()["name"] == "Тестовый ресторан"
+
+        monkeypatch.setattr(settings, "restaurant_snapshot_interval", 0)
+        response = await client.get(
+            f"/restaurants/{test_restaurant.id}",
+            headers={"If-None-Match": restaurant_etag},
+        )
+        assert response.status_code == 200
+        assert response.json()["name"] == "Новое название"
+        response = await client.get("/restaurants", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_restaurant_availability(test_restaurant, test_session_maker):
+    """Тест: свободные слоты по столам, неделя одним вызовом, сброс при подтверждении"""
+    day = (datetime.utcnow() + timedelta(days=2)).date()
+    evening = datetime.combine(day, datetime.min.time()) + timedelta(hours=19)
+    async with test_session_maker() as session:
+        table = RestaurantTable(
+            restaurant_id=test_restaurant.id, number="1", capacity=4
+        )
+        session.add(table)
+        await session.flush()
+        session.add(
+            Booking(
+                restaurant_id=test_restaurant.id,
+                booking_datetime=evening,
+                guests_count=2,
+                status=BookingStatus.CONFIRMED,
+                table_id=table.id,
+                duration_minutes=120,
+            )
+        )
+        await session.commit()
+
+    url = f"/restaurants/{test_restaurant.id}/availability"
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(url, params={"date": day.isoformat()})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["slot_minutes"] == settings.availability_slot_minutes
+        slots = [datetime.fromisoformat(slot) for slot in data["free_slots"]]
+        # Визит 120 минут: свободно до 17:00 и с 21:00
+        assert evening - timedelta(hours=2) in slots
+        assert evening - timedelta(minutes=90) not in slots
+        assert evening + timedelta(minutes=90) not in slots
+        assert evening + timedelta(hours=2) in slots
+
+        response = await client.get(url, params={"date": day.isoformat(), "guests": 5})
+        assert response.json()["free_slots"] == []
+
+        response = await client.get(f"{url}/week", params={"start": day.isoformat()})
+        week = response.json()
+        assert [d["date"] for d in week] == [
+            (day + timedelta(days=i)).isoformat() for i in range(7)
+        ]
+        assert week[0]["free_slots"] == data["free_slots"]
+        assert (
+            len(week[1]["free_slots"]) == 24 * 60 // settings.availability_slot_minutes
+        )
+
+        response = await client.get(
+            f"/restaurants/{test_restaurant.id + 1}/availability",
+            params={"date": day.isoformat()},
+        )
+        assert response.status_code == 404
+
+        # Дни вне горизонта бронирования отклоняются до расчета
+        for params in ({"date": "9999-12-31"}, {"date": "0001-01-01"}):
+            response = await client.get(url, params=params)
+            assert response.status_code == 422
+        response = await client.get(f"{url}/week", params={"start": "9999-12-28"})
+        assert response.status_code == 422
+
+        # Новое подтверждение видно только после сброса кэша событием
+        morning = evening - timedelta(hours=10)
+        async with test_session_maker() as session:
+            session.add(
+                Booking(
+                    restaurant_id=test_restaurant.id,
+                    booking_datetime=morning,
+                    guests_count=2,
+                    status=BookingStatus.CONFIRMED,
+                    table_id=table.id,
+                    duration_minutes=120,
+                )
+            )
+            await session.commit()
+        response = await client.get(url, params={"date": day.isoformat()})
+        assert morning.isoformat() in response.json()["free_slots"]
+
+        availability_cache.invalidate(
+            {
+                "restaurant_id": test_restaurant.id,
+                "booking_datetime": morning.isoformat(),
+                "status": "CONFIRMED",
+            }
+        )
+        response = await client.get(url, params={"date": day.isoformat()})
+        assert morning.isoformat() not in response.json()["free_slots"]
+
+
 @pytest.mark.asyncio
 async def test_get_booking(test_restaurant, test_session_maker):
     """Тест получения информации о бронировании"""
@@ -120,6 +289,31 @@ async def test_get_booking(test_restaurant, test_session_maker):
         assert data["status"] == "CONFIRMED"
 
 
+@pytest.mark.asyncio
+async def test_booking_responses_match_schema(test_restaurant, test_session_maker):
+    """Тест: ответы из строк совпадают с сериализацией BookingResponse"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/bookings",
+            json={
+                "restaurant_id": test_restaurant.id,
+                "booking_datetime": "2030-05-01T19:30:00.123456",
+                "guests_count": 3,
+            },
+        )
+        assert response.status_code == 201
+        created = response.json()
+        fetched = (await client.get(f"/bookings/{created['id']}")).json()
+        listed = (await client.get("/bookings")).json()
+
+    async with test_session_maker() as session:
+        booking = await session.get(Booking, created["id"])
+        expected = BookingResponse.model_validate(booking).model_dump(mode="json")
+
+    assert created == fetched == expected
+    assert listed == {"items": [expected], "next_cursor": None}
+
+
 @pytest.mark.asyncio
 async def test_get_nonexistent_booking(override_db):
     """Тест получения несуществующего бронирования"""
@@ -127,3 +321,363 @@ async def test_get_nonexistent_booking(override_db):
         response = await client.get("/bookings/99999")
 
         assert response.status_code == 404
+
+
+class FakeProducer:
+    """Заглушка producer'а: запоминает события и сразу подтверждает доставку"""
+
+    def __init__(self):
+        self.events = []
+
+    async def send_event(self, event_type, data):
+        self.events.append((event_type, data))
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_result(None)
+        return delivery
+
+
+@pytest.mark.asyncio
+async def test_create_booking_publishes_via_outbox(
+    test_restaurant, test_session_maker, monkeypatch
+):
+    """Тест: событие попадает в outbox и публикуется relay'ем"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post(
+            "/bookings",
+            json={
+                "restaurant_id": test_restaurant.id,
+                "booking_datetime": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+                "guests_count": 2,
+            },
+        )
+    booking_id = response.json()["id"]
+
+    producer = FakeProducer()
+    relay = OutboxRelay(session_maker=test_session_maker, producer=producer)
+    assert await relay.relay_batch() == 1
+    assert await relay.relay_batch() == 0
+
+    assert producer.events[0][0] == "booking.created"
+    assert producer.events[0][1]["booking_id"] == booking_id
+
+    async with test_session_maker() as session:
+        result = await session.execute(select(OutboxEvent))
+        assert result.scalar_one().sent_at is not None
+
+    # Отправленное событие удаляется только после outbox_retention
+    assert await purge_sent_events(test_session_maker, 100) == 0
+    monkeypatch.setattr(settings, "outbox_retention", 0)
+    assert await purge_sent_events(test_session_maker, 100) == 1
+
+
+class SilentProducer(FakeProducer):
+    """Брокер, не подтверждающий доставку"""
+
+    async def send_event(self, event_type: str, data: dict):
+        self.events.append((event_type, data))
+        return asyncio.get_running_loop().create_future()
+
+
+@pytest.mark.asyncio
+async def test_outbox_relay_bounds_ack_wait(
+    test_restaurant, test_session_maker, monkeypatch
+):
+    """Тест: неподтвержденное за outbox_ack_timeout событие остается в outbox"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.post(
+            "/bookings",
+            json={
+                "restaurant_id": test_restaurant.id,
+                "booking_datetime": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+                "guests_count": 2,
+            },
+        )
+
+    monkeypatch.setattr(settings, "outbox_ack_timeout", 0.01)
+    silent = OutboxRelay(session_maker=test_session_maker, producer=SilentProducer())
+    assert await silent.relay_batch() == 0
+    relay = OutboxRelay(session_maker=test_session_maker, producer=FakeProducer())
+    assert await relay.relay_batch() == 1
+
+
+@pytest.mark.asyncio
+async def test_create_booking_idempotency_key(test_restaurant, test_session_maker):
+    """Тест: повтор с тем же Idempotency-Key возвращает исходный ответ без записи"""
+    body = {
+        "restaurant_id": test_restaurant.id,
+        "booking_datetime": (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        "guests_count": 2,
+    }
+    headers = {"Idempotency-Key": "order-42"}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        first = await client.post("/bookings", json=body, headers=headers)
+        assert first.status_code == 201
+
+        # Из кэша worker'а и, после его сброса, из таблицы ключей
+        cached = await client.post("/bookings", json=body, headers=headers)
+        idempotency_cache.clear()
+        stored = await client.post("/bookings", json=body, headers=headers)
+        for response in (cached, stored):
+            assert response.status_code == 201
+            assert response.content == first.content
+            assert response.headers["Idempotent-Replayed"] == "true"
+
+        response = await client.post(
+            "/bookings", json={**body, "guests_count": 3}, headers=headers
+        )
+        assert response.status_code == 422
+
+        # Параллельные повторы с новым ключом ждут первый и получают его ответ
+        idempotency_cache.clear()
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    "/bookings", json=body, headers={"Idempotency-Key": "order-43"}
+                )
+                for _ in range(5)
+            )
+        )
+        assert {r.status_code for r in responses} == {201}
+        assert len({r.json()["id"] for r in responses}) == 1
+
+    async with test_session_maker() as session:
+        result = await session.execute(select(Booking.id))
+        assert len(result.all()) == 2
+        result = await session.execute(select(OutboxEvent.id))
+        assert len(result.all()) == 2
+
+        # Истекший ключ занимается заново, а затем удаляется очисткой
+        key = await session.get(IdempotencyKey, "order-42")
+        key.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await session.commit()
+
+    idempotency_cache.clear()
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/bookings", json=body, headers=headers)
+        assert response.json()["id"] != first.json()["id"]
+        assert "Idempotent-Replayed" not in response.headers
+
+    async with test_session_maker() as session:
+        key = await session.get(IdempotencyKey, "order-42")
+        key.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await session.commit()
+    assert await purge_expired_keys(test_session_maker, 100) == 1
+
+
+@pytest.mark.asyncio
+async def test_create_bookings_batch(test_restaurant, test_session_maker):
+    """Тест пакетного создания бронирований с поэлементными результатами"""
+    booking_datetime = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    items = [
+        {
+            "restaurant_id": test_restaurant.id,
+            "booking_datetime": booking_datetime,
+            "guests_count": guests,
+        }
+        for guests in (2, 0, 4, 3_000_000_000)
+    ]
+    items.append(
+        {
+            "restaurant_id": 99999,
+            "booking_datetime": booking_datetime,
+            "guests_count": 2,
+        }
+    )
+    # Время с часовым поясом сохраняется в UTC
+    items.append(
+        {
+            "restaurant_id": test_restaurant.id,
+            "booking_datetime": "2030-06-01T21:00:00+03:00",
+            "guests_count": 2,
+        }
+    )
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/bookings/batch", json={"items": items})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 3
+    results = data["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4, 5]
+    assert results[0]["booking"]["guests_count"] == 2
+    assert results[1]["error"] is not None
+    assert results[2]["booking"]["status"] == "CREATED"
+    assert results[3]["error"] is not None
+    assert results[4]["error"] is not None
+    assert results[5]["booking"]["booking_datetime"] == "2030-06-01T18:00:00"
+
+    async with test_session_maker() as session:
+        result = await session.execute(select(OutboxEvent))
+        payloads = [event.payload for event in result.scalars().all()]
+    assert sorted(p["booking_id"] for p in payloads) == sorted(
+        r["booking"]["id"] for r in results if r["booking"]
+    )
+
+    # Размер пачки ограничен схемой, до обработки элементов
+    items = items[:1] * (settings.booking_batch_max_size + 1)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.post("/bookings/batch", json={"items": items})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_get_booking_etag_and_invalidation(test_restaurant, test_session_maker):
+    """Тест: ETag/304 и сброс кэша по событию смены статуса"""
+    async with test_session_maker() as session:
+        booking = Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=datetime.utcnow() + timedelta(days=1),
+            guests_count=2,
+            status=BookingStatus.CREATED,
+        )
+        session.add(booking)
+        await session.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(f"/bookings/{booking.id}")
+        etag = response.headers["ETag"]
+        assert response.json()["status"] == "CREATED"
+
+        response = await client.get(
+            f"/bookings/{booking.id}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+        async with test_session_maker() as session:
+            booking.status = BookingStatus.CONFIRMED
+            await session.merge(booking)
+            await session.commit()
+
+        # Пока событие не пришло, отдается закэшированный ответ
+        response = await client.get(f"/bookings/{booking.id}")
+        assert response.json()["status"] == "CREATED"
+
+        invalidate_booking_cache({"booking_id": booking.id, "status": "CONFIRMED"})
+        response = await client.get(
+            f"/bookings/{booking.id}", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "CONFIRMED"
+        assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_wait_booking_returns_on_status_event(
+    test_restaurant, test_session_maker
+):
+    """Тест: long-poll отвечает по событию смены статуса, а не по timeout"""
+    async with test_session_maker() as session:
+        booking = Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=datetime.utcnow() + timedelta(days=1),
+            guests_count=2,
+            status=BookingStatus.CREATED,
+        )
+        session.add(booking)
+        await session.commit()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        # Без события запрос отвечает текущим статусом по истечении timeout
+        response = await client.get(f"/bookings/{booking.id}/wait?timeout=0.05")
+        assert response.json()["status"] == "CREATED"
+
+        waiting = asyncio.create_task(
+            client.get(f"/bookings/{booking.id}/wait?timeout=30")
+        )
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        assert len(booking_waiters) == 1
+        # Ожидающий запрос не держит соединение с БД
+        assert test_session_maker.kw["bind"].pool.checkedout() == 0
+
+        async with test_session_maker() as session:
+            booking.status = BookingStatus.CONFIRMED
+            await session.merge(booking)
+            await session.commit()
+        event = {"booking_id": booking.id, "status": "CONFIRMED"}
+        invalidate_booking_cache(event)
+        booking_waiters.notify(event)
+
+        response = await asyncio.wait_for(waiting, 1)
+        assert response.status_code == 200
+        assert response.json()["status"] == "CONFIRMED"
+        assert len(booking_waiters) == 0
+
+        response = await client.get(f"/bookings/{booking.id}/wait?timeout=600")
+        assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_list_bookings_keyset_pagination(
+    test_restaurant, test_session_maker, monkeypatch
+):
+    """Тест keyset-пагинации списка бронирований с фильтрами"""
+    monkeypatch.setattr(settings, "bookings_page_size", 2)
+    base = datetime(2030, 1, 1, 18, 0)
+    async with test_session_maker() as session:
+        session.add_all(
+            Booking(
+                restaurant_id=test_restaurant.id,
+                booking_datetime=base + timedelta(hours=i % 3),
+                guests_count=2,
+                status=BookingStatus.CONFIRMED if i < 3 else BookingStatus.REJECTED,
+            )
+            for i in range(6)
+        )
+        await session.commit()
+
+    async def fetch_all(client, params):
+        items = []
+        while True:
+            response = await client.get("/bookings", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 2
+            items.extend(page["items"])
+            if page["next_cursor"] is None:
+                return items
+            params = {**params, "after": page["next_cursor"]}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        seen = await fetch_all(client, {"restaurant_id": test_restaurant.id})
+        confirmed = await fetch_all(
+            client, {"restaurant_id": test_restaurant.id, "status": "CONFIRMED"}
+        )
+
+        response = await client.get("/bookings", params={"after": "garbage"})
+        assert response.status_code == 400
+
+        # Время с часовым поясом (суффикс Z) сравнивается как UTC
+        since = await fetch_all(
+            client,
+            {"restaurant_id": test_restaurant.id, "from": "2030-01-01T19:00:00Z"},
+        )
+        cursor = base64.urlsafe_b64encode(b"2030-01-01T19:00:00Z|0").decode()
+        after = await fetch_all(
+            client, {"restaurant_id": test_restaurant.id, "after": cursor}
+        )
+
+    assert len(seen) == 6
+    keys = [(b["booking_datetime"], b["id"]) for b in seen]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == 6
+    assert len(confirmed) == 3
+    assert all(b["status"] == "CONFIRMED" for b in confirmed)
+    assert len(since) == 4
+    assert all(b["booking_datetime"] >= "2030-01-01T19:00:00" for b in since)
+    assert after == since
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(override_db):
+    """Тест: /metrics отдает латентность по шаблону маршрута и метрики пула"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/bookings/99999")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.text
+    assert 'route="/bookings/{booking_id}"' in body
+    assert "db_pool_checked_out" in body
@@ -0,0 +1,35 @@
+"""Тесты пула соединений с метриками"""
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.pool import InstrumentedQueuePool, pool_stats
+from tests.test_api import TEST_DATABASE_URL
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_count_checkouts_and_timeouts():
+    """Тест: статистика пула учитывает занятые соединения и таймауты"""
+    engine = create_async_engine(
+        TEST_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert pool_stats(engine)["checked_out"] == 1
+
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0
+        assert stats["timeouts"] == 1
+        assert stats["acquisitions"] == 2
+        assert stats["wait_seconds_max"] >= 0.1
+    finally:
+        await engine.dispose()
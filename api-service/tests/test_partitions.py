@@ -0,0 +1,51 @@
+"""Тесты обслуживания секций bookings"""
+
+import csv
+import gzip
+from datetime import date, datetime, timezone
+import asyncpg
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.partitions import archive_cutoff, archive_partitions, ensure_partitions
+from tests.test_api import TEST_DATABASE_URL
+
+
+def test_archive_cutoff():
+    """Тест: граница архивирования считается в месяцах с переходом через год"""
+    assert archive_cutoff(date(2024, 3, 15), 0) == date(2024, 3, 1)
+    assert archive_cutoff(date(2024, 3, 15), 2) == date(2024, 1, 1)
+    assert archive_cutoff(date(2024, 3, 15), 14) == date(2023, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_ensure_partitions_without_partitioned_schema():
+    """Тест: схема из create_all (без миграции 008) пропускается"""
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        assert await ensure_partitions(async_sessionmaker(engine), 3) == 0
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_archive_detached_partition(tmp_path):
+    """Тест: старая секция выгружается в gzip CSV и удаляется, текущая остается"""
+    conn = await asyncpg.connect(TEST_DATABASE_URL.replace("+asyncpg", ""))
+    current = f"bookings_p{datetime.now(timezone.utc):%Y_%m}"
+    try:
+        # Отключенная секция прерванного запуска и секция текущего месяца
+        for table in ("bookings_p2000_01", current):
+            await conn.execute(f"CREATE TABLE {table} (id integer, status text)")
+            await conn.execute(f"INSERT INTO {table} VALUES (1, 'CONFIRMED')")
+
+        archived = await archive_partitions(conn, 12, str(tmp_path))
+
+        assert archived == [str(tmp_path / "bookings_p2000_01.csv.gz")]
+        with gzip.open(archived[0], "rt") as f:
+            assert list(csv.reader(f)) == [["id", "status"], ["1", "CONFIRMED"]]
+        assert await conn.fetchval("SELECT to_regclass('bookings_p2000_01')") is None
+        assert await conn.fetchval(f"SELECT to_regclass('{current}')") is not None
+    finally:
+        for table in ("bookings_p2000_01", current):
+            await conn.execute(f"DROP TABLE IF EXISTS {table}")
+        await conn.close()
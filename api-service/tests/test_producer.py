@@ -0,0 +1,208 @@
+"""Unit-тесты для асинхронного Kafka producer и listener статусов"""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+import pytest_asyncio
+from aiokafka.errors import KafkaConnectionError
+from app.config import settings
+from app.kafka.codec import decode_event, encode_event
+from app.kafka.consumer import BookingStatusListener
+from app.kafka.producer import KafkaProducer
+
+
+class FakeAIOKafkaProducer:
+    """Заглушка AIOKafkaProducer: подтверждения выдаются вручную"""
+
+    def __init__(self):
+        self.sent = []
+        self.keys = []
+        self.headers = []
+        self.acks = []
+
+    async def send(self, topic, value, key=None, headers=None):
+        ack = asyncio.get_running_loop().create_future()
+        self.sent.append((topic, value))
+        self.keys.append(key)
+        self.headers.append(headers)
+        self.acks.append(ack)
+        return ack
+
+    async def stop(self):
+        pass
+
+
+@pytest_asyncio.fixture
+async def producer():
+    """Producer с подмененным клиентом Kafka"""
+    producer = KafkaProducer()
+    producer.producer = FakeAIOKafkaProducer()
+    producer._queue = asyncio.Queue(maxsize=10)
+    producer._flush_task = asyncio.create_task(producer._flush_loop())
+    return producer
+
+
+@pytest.mark.asyncio
+async def test_send_event_does_not_wait_for_ack(producer):
+    """Тест: send_event возвращается до подтверждения брокера"""
+    deliveries = [
+        await producer.send_event("booking.created", {"booking_id": i})
+        for i in range(3)
+    ]
+    await producer._queue.join()
+
+    assert len(producer.producer.sent) == 3
+    assert not any(d.done() for d in deliveries)
+    assert producer.stats["batches"] == 1
+
+    for ack in producer.producer.acks:
+        ack.set_result(None)
+    await asyncio.gather(*deliveries)
+
+    assert producer.stats["sent"] == 3
+    await producer.close()
+
+
+@pytest.mark.asyncio
+async def test_delivery_callback_reports_failure(producer):
+    """Тест: ошибка доставки передается в future и callback"""
+    reported = []
+    producer.add_delivery_callback(
+        lambda event, error, latency: reported.append((event, error))
+    )
+
+    delivery = await producer.send_event("booking.created", {"booking_id": 1})
+    await producer._queue.join()
+    producer.producer.acks[0].set_exception(RuntimeError("broker down"))
+
+    with pytest.raises(RuntimeError):
+        await delivery
+
+    assert producer.stats["failed"] == 1
+    assert reported[0][0]["data"]["booking_id"] == 1
+    assert isinstance(reported[0][1], RuntimeError)
+    await producer.close()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_send_error_fails_only_its_event(producer):
+    """Тест: не-Kafka ошибка события не останавливает отправку остальных"""
+    broken = await producer.send_event("booking.created", {"booking_id": object()})
+    delivery = await producer.send_event("booking.created", {"booking_id": 2})
+    await producer._queue.join()
+
+    with pytest.raises(TypeError):
+        await broken
+    assert not producer._flush_task.done()
+    producer.producer.acks[0].set_result(None)
+    await delivery
+    await asyncio.wait_for(producer.close(), 1)
+
+
+@pytest.mark.asyncio
+async def test_close_after_flush_task_finished(producer):
+    """Тест: close не ждет очередь, которую уже некому разобрать"""
+    producer._flush_task.cancel()
+    await asyncio.sleep(0)
+    delivery = await producer.send_event("booking.created", {"booking_id": 1})
+
+    await asyncio.wait_for(producer.close(), 1)
+    with pytest.raises(KafkaConnectionError):
+        await delivery
+
+
+@pytest.mark.asyncio
+async def test_events_keyed_by_restaurant(producer):
+    """Тест: ключ сообщения — restaurant_id"""
+    await producer.send_event("booking.created", {"booking_id": 1, "restaurant_id": 7})
+    await producer.send_event("booking.created", {"booking_id": 2})
+    await producer._queue.join()
+
+    assert producer.producer.keys == [7, None]
+    for ack in producer.producer.acks:
+        ack.set_result(None)
+    await producer.close()
+
+
+@pytest.mark.asyncio
+async def test_events_encoded_with_configured_codec(producer, monkeypatch):
+    """Тест: формат события передается заголовком, неподходящие события — в JSON"""
+    monkeypatch.setattr(settings, "kafka_event_codec", "struct.v1")
+    data = {
+        "booking_id": 1,
+        "restaurant_id": 7,
+        "booking_datetime": "2024-06-01T19:30:00",
+        "guests_count": 4,
+    }
+    await producer.send_event("booking.created", data)
+    await producer.send_event("booking.created", {"booking_id": 2})
+    await producer._queue.join()
+
+    assert producer.producer.headers == [
+        [("codec", b"struct.v1")],
+        [("codec", b"json")],
+    ]
+    (_, binary), (_, json_value) = producer.producer.sent
+    assert len(binary) < len(json_value)
+    assert decode_event(binary, producer.producer.headers[0]) == {
+        "event_type": "booking.created",
+        "data": data,
+    }
+    for ack in producer.producer.acks:
+        ack.set_result(None)
+    await producer.close()
+
+
+def test_struct_codec_roundtrip():
+    """Тест: бинарный формат восстанавливает событие символ в символ"""
+    event = {
+        "event_type": "booking.status_changed",
+        "data": {
+            "booking_id": 10,
+            "restaurant_id": 3,
+            "booking_datetime": "2024-06-01T19:30:00.250000",
+            "status": "CONFIRMED",
+        },
+    }
+    value, headers = encode_event(event, "struct.v1")
+
+    assert headers == [("codec", b"struct.v1")]
+    assert decode_event(value, headers) == event
+    # Сообщения без заголовка — JSON прежних producer'ов
+    assert decode_event(b'{"event_type": "x", "data": {}}') == {
+        "event_type": "x",
+        "data": {},
+    }
+    with pytest.raises(ValueError):
+        decode_event(b"\x09", headers)
+
+
+@pytest.mark.asyncio
+async def test_status_listener_survives_failing_events():
+    """Тест: нераспознанное событие и упавший обработчик не останавливают listener"""
+
+    def message(offset, value, headers=()):
+        return SimpleNamespace(
+            topic="booking_status",
+            partition=0,
+            offset=offset,
+            value=value,
+            headers=headers,
+        )
+
+    async def messages():
+        event = {"event_type": "booking.status_changed", "data": {"booking_id": 1}}
+        value, headers = encode_event(event, "json")
+        yield message(0, b"not json")
+        yield message(1, value, [("codec", b"unknown")])
+        yield message(2, b"[]")
+        yield message(3, value, headers)
+
+    listener = BookingStatusListener()
+    listener.consumer = messages()
+    received = []
+    listener.add_handler(received.append)
+
+    await listener._run()
+
+    assert received == [{"booking_id": 1}]
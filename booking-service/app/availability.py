@@ -0,0 +1,65 @@
+"""Назначение столов с учетом вместимости и длительности визита"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Optional
+
+
+class TableSchedule:
+    """
+    Занятые интервалы одного стола.
+
+    Подтвержденные визиты за одним столом не пересекаются, поэтому списки
+    начал и концов отсортированы одновременно, и проверка пересечения —
+    это один бинарный поиск и сравнение с соседями: O(log n) на стол.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts: list[datetime] = []
+        self.ends: list[datetime] = []
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """Интервал [start, end) не пересекается с занятыми"""
+        i = bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return False
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def add(self, start: datetime, end: datetime):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+
+class RestaurantSchedule:
+    """
+    Расписание столов ресторана.
+
+    Для визита выбирается самый маленький свободный стол, вмещающий гостей
+    (при равной вместимости — с меньшим id), чтобы большие столы оставались
+    для больших компаний.
+    """
+
+    def __init__(self, tables: list[tuple[int, int]]):
+        # (capacity, table_id) в порядке предпочтения
+        self.tables = sorted((capacity, table_id) for table_id, capacity in tables)
+        self.capacities = [capacity for capacity, _ in self.tables]
+        self.schedules = {table_id: TableSchedule() for _, table_id in self.tables}
+
+    def occupy(self, table_id: int, start: datetime, end: datetime):
+        """Учет уже подтвержденного визита"""
+        schedule = self.schedules.get(table_id)
+        if schedule is not None:
+            schedule.add(start, end)
+
+    def assign(self, start: datetime, end: datetime, guests: int) -> Optional[int]:
+        """Назначение стола; None, если подходящих свободных столов нет"""
+        first = bisect_left(self.capacities, guests)
+        for _, table_id in self.tables[first:]:
+            schedule = self.schedules[table_id]
+            if schedule.is_free(start, end):
+                schedule.add(start, end)
+                return table_id
+        return None
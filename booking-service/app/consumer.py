@@ -1,14 +1,32 @@
 """Kafka Consumer для обработки событий бронирования"""
 
+import argparse
 import asyncio
-import json
 import logging
-from datetime import datetime
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+import multiprocessing
+import signal
+import time
+from collections import OrderedDict
+from typing import Optional
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, TopicPartition
+from aiokafka.errors import KafkaError
+from app.codec import decode_event
 from app.config import settings
-from app.database import async_session_maker
+from app.database import async_session_maker, engine
+from app.metrics import (
+    CONSUMER_LAG,
+    DUPLICATE_EVENTS,
+    EVENT_PROCESSING_TIME,
+    RETRIED_EVENTS,
+    start_metrics_server,
+)
+from app.occupancy import slot_index
+from app.offsets import OffsetTracker
+from app.pool import pool_stats
+from app.producer import status_publisher
+from app.retry import next_attempt, retry_at
 from app.services.booking_service import BookingService
+from app.sweeper import StuckBookingSweeper
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -16,89 +34,499 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _format_partitions(partitions) -> str:
+    return ", ".join(sorted(f"{tp.topic}[{tp.partition}]" for tp in partitions)) or "-"
+
+
+class PartitionRebalanceListener(ConsumerRebalanceListener):
+    """
+    Логирование назначения партиций при ребалансировке группы.
+
+    Перед отдачей партиций дожидается уже запущенных обработок, чтобы
+    новый владелец партиции не обрабатывал события ресторана параллельно;
+    еще не запущенные сообщения отданных партиций отбрасываются.
+    После назначения прогревает индекс слотов ресторанов своих партиций.
+    """
+
+    def __init__(self, consumer: "BookingEventConsumer"):
+        self.consumer = consumer
+
+    async def on_partitions_revoked(self, revoked):
+        logger.info(
+            f"Worker {self.consumer.worker_index}: partitions revoked: "
+            f"{_format_partitions(revoked)}"
+        )
+        self.consumer.revoked.update(revoked)
+        await self.consumer.drain()
+        await self.consumer.commit_offsets()
+        self.consumer.offsets.forget(revoked)
+        slot_index.release()
+
+    async def on_partitions_assigned(self, assigned):
+        logger.info(
+            f"Worker {self.consumer.worker_index}: partitions assigned: "
+            f"{_format_partitions(assigned)}"
+        )
+        self.consumer.revoked.difference_update(assigned)
+        await slot_index.warm(
+            async_session_maker,
+            {tp.partition for tp in assigned if tp.topic == settings.KAFKA_TOPIC},
+            len(
+                self.consumer.consumer.partitions_for_topic(settings.KAFKA_TOPIC) or ()
+            ),
+        )
+
+
 class BookingEventConsumer:
-    """Consumer для обработки событий бронирования"""
+    """
+    Consumer для обработки событий бронирования.
 
-    def __init__(self):
+    Работает в одном долгоживущем event loop: пул соединений БД остается
+    прогретым на все время жизни процесса. События одного poll'а (до
+    CONSUMER_BATCH_SIZE) обрабатываются пачкой; пачки обрабатываются
+    конкурентно (не больше CONSUMER_MAX_IN_FLIGHT одновременно), но события
+    одного ресторана — строго по очереди, в порядке чтения из партиции.
+
+    События ключуются по restaurant_id, поэтому несколько consumer'ов
+    в одной группе (в том числе процессы, см. run_workers) не обрабатывают
+    события одного ресторана одновременно.
+
+    Offset'ы коммитятся вручную, раз в CONSUMER_COMMIT_INTERVAL секунд и
+    только для сообщений, чья транзакция в БД уже закоммичена. Повторно
+    доставленные события отбрасываются по кэшу недавно обработанных
+    бронирований, а при промахе кэша — по текущему статусу бронирования.
+
+    Упавшие события не задерживают партицию: они уходят в KAFKA_RETRY_TOPIC
+    с экспоненциальной задержкой (см. app.retry), а исчерпав попытки —
+    в KAFKA_DLQ_TOPIC. Повторы обрабатываются по одному, не раньше своего
+    времени и вне очереди ресторана.
+    """
+
+    def __init__(self, worker_index: int = 0):
+        self.worker_index = worker_index
         self.consumer = None
         self.running = False
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        # Последняя задача по каждому ресторану: следующая ждет ее завершения
+        self._restaurant_tails: dict[object, asyncio.Task] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._main_task: Optional[asyncio.Task] = None
+        # Повторы, ожидающие своего времени, по (topic, partition, offset)
+        self._delayed: dict[tuple, asyncio.TimerHandle] = {}
+        self._sweeper_task: Optional[asyncio.Task] = None
+        self.offsets = OffsetTracker()
+        # Отданные при ребалансировке партиции, пока их не назначат снова
+        self.revoked: set[TopicPartition] = set()
+        self._committed_at = time.monotonic()
+        # id бронирований, уже доведенных до финального статуса
+        self._processed: OrderedDict[int, None] = OrderedDict()
+        self._pool_stats_logged_at = time.monotonic()
 
-    def connect(self):
+    async def connect(self):
         """Подключение к Kafka"""
+        consumer = AIOKafkaConsumer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(","),
+            group_id=settings.KAFKA_GROUP_ID,
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+        )
+        consumer.subscribe(
+            [settings.KAFKA_TOPIC, settings.KAFKA_RETRY_TOPIC],
+            listener=PartitionRebalanceListener(self),
+        )
+        # Первое назначение партиций приходит внутри start(), и слушатель
+        # уже обращается к consumer'у
+        self.consumer = consumer
         try:
-            self.consumer = KafkaConsumer(
-                settings.KAFKA_TOPIC,
-                bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(","),
-                group_id=settings.KAFKA_GROUP_ID,
-                auto_offset_reset="earliest",
-                enable_auto_commit=True,
-                value_deserializer=lambda m: json.loads(m.decode("utf-8")),
-            )
-            logger.info(f"Connected to Kafka: {settings.KAFKA_BOOTSTRAP_SERVERS}")
-            logger.info(f"Subscribed to topic: {settings.KAFKA_TOPIC}")
+            await consumer.start()
         except KafkaError as e:
+            self.consumer = None
+            await consumer.stop()
             logger.error(f"Failed to connect to Kafka: {e}")
             raise
 
+        logger.info(f"Connected to Kafka: {settings.KAFKA_BOOTSTRAP_SERVERS}")
+        logger.info(
+            f"Subscribed to topics: {settings.KAFKA_TOPIC}, {settings.KAFKA_RETRY_TOPIC}"
+        )
+
+    @staticmethod
+    def decode(message) -> dict:
+        """
+        Событие из сообщения; формат определяется по заголовку codec.
+
+        Нераспознанное сообщение становится пустым событием: оно
+        пропускается как событие неизвестного типа и не блокирует партицию.
+        """
+        try:
+            return decode_event(message.value, message.headers)
+        except ValueError as e:
+            logger.error(
+                f"Undecodable message {message.topic}[{message.partition}]"
+                f"@{message.offset} skipped: {e}"
+            )
+            return {}
+
     async def process_event(self, event: dict):
         """Обработка события"""
-        event_type = event.get("event_type")
-        data = event.get("data", {})
+        await self.process_events([event])
 
-        logger.info(f"Processing event: {event_type}")
+    async def process_events(self, events: list[dict]):
+        """
+        Обработка событий одного poll'а.
 
-        if event_type == "booking.created":
-            booking_id = data.get("booking_id")
-            if not booking_id:
+        Все booking.created обрабатываются одной пачкой в одной транзакции.
+        Ошибка БД пробрасывается: offset'ы таких событий не коммитятся.
+        """
+        created = []
+        for event in events:
+            event_type = event.get("event_type")
+            data = event.get("data", {})
+            logger.info(f"Processing event: {event_type}")
+
+            if event_type != "booking.created":
+                logger.warning(f"Unknown event type: {event_type}")
+            elif not data.get("booking_id"):
                 logger.error("Missing booking_id in event data")
-                return
-
-            # Обрабатываем бронирование
-            async with async_session_maker() as db:
-                try:
-                    await BookingService.process_booking(db, booking_id)
-                except Exception as e:
-                    logger.error(f"Error processing booking {booking_id}: {e}")
+            elif data["booking_id"] in self._processed:
+                logger.info(f"Booking {data['booking_id']}: duplicate event skipped")
+                DUPLICATE_EVENTS.inc()
+            else:
+                created.append(data)
+
+        if not created:
+            return
+
+        if settings.PUBLISH_CHECKING_STATUS:
+            for data in created:
+                await status_publisher.publish_checking(data)
+
+        booking_ids = [data["booking_id"] for data in created]
+
+        # Обрабатываем бронирования; уже обработанные отсекает сам запрос
+        async with async_session_maker() as db:
+            bookings = await BookingService.process_batch(db, booking_ids)
+        DUPLICATE_EVENTS.inc(len(booking_ids) - len(bookings))
+        self._remember_processed(booking_ids)
+        for booking in bookings:
+            await status_publisher.publish(booking)
+
+    def _remember_processed(self, booking_ids: list[int]):
+        for booking_id in booking_ids:
+            self._processed[booking_id] = None
+            self._processed.move_to_end(booking_id)
+        while len(self._processed) > settings.CONSUMER_DEDUP_CACHE_SIZE:
+            self._processed.popitem(last=False)
+
+    async def dispatch(self, messages: list):
+        """
+        Запуск обработки пачки сообщений в фоне.
+
+        Пачка ждет завершения предыдущих обработок тех же ресторанов.
+        Сам вызов ждет только когда исчерпан лимит одновременных обработок.
+        Сообщения партиций, отданных за время ожидания, не запускаются:
+        их обработает новый владелец.
+        """
+        await self._in_flight_limit().acquire()
+        messages = [
+            m
+            for m in messages
+            if TopicPartition(m.topic, m.partition) not in self.revoked
+        ]
+        if not messages:
+            self._in_flight.release()
+            return
+        self.offsets.track(messages)
+
+        keys = {m.value.get("data", {}).get("restaurant_id") for m in messages}
+        previous = {
+            self._restaurant_tails[key] for key in keys if key in self._restaurant_tails
+        }
+        task = asyncio.create_task(self._handle(messages, previous))
+        for key in keys:
+            self._restaurant_tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._on_task_done(keys, t))
+
+    def dispatch_retry(self, message):
+        """Отложенный запуск повтора события к его времени retry_at"""
+        self.offsets.track([message])
+        key = (message.topic, message.partition, message.offset)
+        delay = max(retry_at(message.value) - time.time(), 0)
+        self._delayed[key] = asyncio.get_running_loop().call_later(
+            delay, self._start_retry, key, message
+        )
+
+    def _start_retry(self, key: tuple, message):
+        del self._delayed[key]
+        task = asyncio.create_task(self._handle_retry(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle_retry(self, message):
+        """Повтор обрабатывается отдельно, в общем лимите одновременных обработок"""
+        async with self._in_flight_limit():
+            await self._handle([message], set())
+
+    def _in_flight_limit(self) -> asyncio.Semaphore:
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(settings.CONSUMER_MAX_IN_FLIGHT)
+        return self._in_flight
+
+    def _on_task_done(self, keys: set, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._in_flight.release()
+        for key in keys:
+            if self._restaurant_tails.get(key) is task:
+                del self._restaurant_tails[key]
+
+    async def _handle(self, messages: list, previous: set[asyncio.Task]):
+        """Обработка пачки после предыдущих событий тех же ресторанов"""
+        if previous:
+            await asyncio.wait(previous)
+
+        events = [m.value for m in messages]
+        started = time.perf_counter()
+        try:
+            await self.process_events(events)
+        except Exception as e:
+            logger.error(f"Error processing events {events}: {e}")
+            if len(messages) > 1:
+                # Пачка разбирается по одному событию: на повтор уходят
+                # только те, что падают и поодиночке
+                failed = await self._process_each(messages)
+            else:
+                failed = [(messages[0], e)]
+            if await self.schedule_retries(failed):
+                self.offsets.complete(messages)
         else:
-            logger.warning(f"Unknown event type: {event_type}")
+            self.offsets.complete(messages)
+        # Время пачки делится поровну между ее событиями
+        elapsed = (time.perf_counter() - started) / len(events)
+        for event in events:
+            EVENT_PROCESSING_TIME.labels(event.get("event_type", "unknown")).observe(
+                elapsed
+            )
+        self.record_lag(messages)
+        self.log_pool_stats()
+
+    async def _process_each(self, messages: list) -> list[tuple]:
+        """Поштучная обработка; возвращает пары (сообщение, ошибка) упавших"""
+        failed = []
+        for message in messages:
+            try:
+                await self.process_events([message.value])
+            except Exception as e:
+                failed.append((message, e))
+        return failed
+
+    async def schedule_retries(self, failed: list[tuple]) -> bool:
+        """
+        Отправка упавших событий на повтор или в dead letter.
+
+        True, если брокер подтвердил все отправки и offset'ы исходных
+        сообщений можно коммитить. Иначе offset'ы остаются незакоммиченными,
+        и события будут доставлены повторно после перезапуска.
+        """
+        sent = await asyncio.gather(
+            *(self._reschedule(message.value, error) for message, error in failed)
+        )
+        return all(sent)
+
+    async def _reschedule(self, event: dict, error: Exception) -> bool:
+        topic, payload = next_attempt(event, error)
+        key = event.get("data", {}).get("restaurant_id")
+        if not await status_publisher.send_and_wait(topic, payload, key=key):
+            return False
 
-    def start(self):
+        booking_id = event.get("data", {}).get("booking_id")
+        if topic == settings.KAFKA_DLQ_TOPIC:
+            RETRIED_EVENTS.labels("dead_letter").inc()
+            logger.error(f"Booking {booking_id}: retries exhausted, sent to {topic}")
+        else:
+            RETRIED_EVENTS.labels("retry").inc()
+            logger.warning(
+                f"Booking {booking_id}: retry {payload['retry']['attempt']} scheduled"
+            )
+        return True
+
+    async def start(self):
         """Запуск consumer"""
-        self.connect()
+        await self.connect()
+        start_metrics_server(self.worker_index)
+        try:
+            await status_publisher.connect()
+        except KafkaError:
+            logger.warning("Status events disabled: API caches will rely on TTL")
         self.running = True
+        # В процессах-worker'ах sweeper один на хост; между хостами строки
+        # разделяет SKIP LOCKED
+        if self.worker_index == 0 and settings.SWEEPER_INTERVAL > 0:
+            self._sweeper_task = asyncio.create_task(StuckBookingSweeper().run())
+
+        self._main_task = asyncio.current_task()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop)
 
         logger.info("Booking Service started. Waiting for events...")
 
         try:
-            for message in self.consumer:
-                if not self.running:
-                    break
-
-                event = message.value
-                logger.info(f"Received event: {event}")
+            while self.running:
+                batches = await self.consumer.getmany(
+                    timeout_ms=1000, max_records=settings.CONSUMER_BATCH_SIZE
+                )
+                messages = [m for batch in batches.values() for m in batch]
+                if messages:
+                    logger.info(f"Received {len(messages)} events")
+                for message in messages:
+                    message.value = self.decode(message)
+                retries = [m for m in messages if m.topic == settings.KAFKA_RETRY_TOPIC]
+                for message in retries:
+                    self.dispatch_retry(message)
+                if len(retries) < len(messages):
+                    await self.dispatch(
+                        [m for m in messages if m.topic != settings.KAFKA_RETRY_TOPIC]
+                    )
 
-                # Запускаем обработку события в asyncio
-                asyncio.run(self.process_event(event))
+                if (
+                    time.monotonic() - self._committed_at
+                    >= settings.CONSUMER_COMMIT_INTERVAL
+                ):
+                    await self.commit_offsets()
 
-        except KeyboardInterrupt:
+        except asyncio.CancelledError:
             logger.info("Shutting down...")
         except Exception as e:
             logger.error(f"Error in consumer loop: {e}")
         finally:
-            self.stop()
+            await self.stop()
 
-    def stop(self):
-        """Остановка consumer"""
+    def request_stop(self):
+        """Остановка по сигналу: прерываем ожидание новых сообщений"""
+        if not self.running:
+            return
         self.running = False
+        if self._main_task:
+            self._main_task.cancel()
+
+    def record_lag(self, messages: list):
+        """Отставание по партициям пачки по последнему известному high watermark"""
+        if self.consumer is None:
+            return
+        # Пачка getmany может охватывать несколько партиций
+        last_offsets: dict[TopicPartition, int] = {}
+        for m in messages:
+            tp = TopicPartition(m.topic, m.partition)
+            last_offsets[tp] = max(last_offsets.get(tp, -1), m.offset)
+        for tp, offset in last_offsets.items():
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None:
+                CONSUMER_LAG.labels(tp.topic, tp.partition).set(highwater - offset - 1)
+
+    def log_pool_stats(self, force: bool = False):
+        """Периодический вывод состояния пула соединений БД"""
+        now = time.monotonic()
+        if force or now - self._pool_stats_logged_at >= settings.DB_POOL_STATS_INTERVAL:
+            self._pool_stats_logged_at = now
+            logger.info(f"DB pool stats: {pool_stats(engine)}")
+
+    async def commit_offsets(self):
+        """Коммит offset'ов обработанных сообщений одним запросом"""
+        self._committed_at = time.monotonic()
+        offsets = self.offsets.committable()
+        if not offsets or self.consumer is None:
+            return
+        try:
+            await self.consumer.commit(offsets)
+        except KafkaError as e:
+            logger.warning(f"Offset commit failed, will retry: {e}")
+            return
+        self.offsets.mark_committed(offsets)
+
+    async def drain(self):
+        """
+        Ожидание завершения уже запущенных обработок.
+
+        Повторы, чье время еще не пришло, отменяются: их offset'ы не
+        закоммичены, и повторы получит следующий владелец партиции.
+        """
+        for handle in self._delayed.values():
+            handle.cancel()
+        self._delayed.clear()
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+
+    async def stop(self):
+        """Остановка consumer: дожидаемся уже запущенных обработок"""
+        self.running = False
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+        await self.drain()
+        await self.commit_offsets()
         if self.consumer:
-            self.consumer.close()
+            await self.consumer.stop()
+            self.consumer = None
             logger.info("Consumer closed")
+        await status_publisher.close()
+        self.log_pool_stats(force=True)
+        await engine.dispose()
+
+
+def run_worker(worker_index: int = 0):
+    """Запуск одного consumer'а в текущем процессе"""
+    consumer = BookingEventConsumer(worker_index)
+    asyncio.run(consumer.start())
+
+
+def run_workers(count: int):
+    """
+    Запуск count процессов-consumer'ов одной группы.
+
+    Kafka распределяет партиции между процессами, события одного ресторана
+    остаются в одной партиции. Число процессов больше числа партиций
+    не ускоряет обработку: лишние процессы простаивают.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(
+            target=run_worker, args=(index,), name=f"booking-worker-{index}"
+        )
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Started {count} consumer workers")
+
+    def forward(signum, frame):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+
+    for worker in workers:
+        worker.join()
+        if worker.exitcode:
+            logger.error(f"{worker.name} exited with code {worker.exitcode}")
 
 
 def main():
     """Главная функция"""
-    consumer = BookingEventConsumer()
-    consumer.start()
+    parser = argparse.ArgumentParser(description="Booking Service consumer")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.CONSUMER_WORKERS,
+        help="Число процессов-consumer'ов в группе",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args.workers)
+    else:
+        run_worker()
 
 
 if __name__ == "__main__":
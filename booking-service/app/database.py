@@ -1,13 +1,34 @@
 """Конфигурация базы данных"""
 
+import logging
+import random
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
+from app.pool import InstrumentedQueuePool
+
+logger = logging.getLogger(__name__)
 
 # Заменяем postgresql:// на postgresql+asyncpg:// для asyncpg драйвера
 DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Кэш подготовленных запросов: asyncpg и диалекта SQLAlchemy
+# (0 отключает оба, например, за pgbouncer в transaction mode)
+engine = create_async_engine(
+    make_url(DATABASE_URL).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)}
+    ),
+    echo=settings.DB_ECHO,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 async_session_maker = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -15,6 +36,15 @@ async_session_maker = async_sessionmaker(
 Base = declarative_base()
 
 
+if not settings.DB_ECHO and settings.DB_ECHO_SAMPLE_RATE > 0:
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _log_sampled_statement(conn, cursor, statement, parameters, context, many):
+        """Логирование доли запросов вместо полного echo"""
+        if random.random() < settings.DB_ECHO_SAMPLE_RATE:
+            logger.info(f"SQL: {statement}")
+
+
 async def get_db_session():
     """Получение сессии БД"""
     async with async_session_maker() as session:
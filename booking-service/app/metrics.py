@@ -0,0 +1,91 @@
+"""Prometheus-метрики Booking Service"""
+
+import time
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from app.config import settings
+from app.database import engine
+from app.pool import pool_stats
+
+EVENT_PROCESSING_TIME = Histogram(
+    "consumer_event_processing_seconds",
+    "Время обработки одного события consumer'ом",
+    ["event_type"],
+)
+CONSUMER_LAG = Gauge(
+    "consumer_lag_messages",
+    "Отставание consumer'а от конца партиции",
+    ["topic", "partition"],
+)
+DUPLICATE_EVENTS = Counter(
+    "consumer_duplicate_events_total",
+    "Повторно доставленные события, пропущенные без обработки",
+)
+RETRIED_EVENTS = Counter(
+    "consumer_retried_events_total",
+    "Упавшие события, отправленные на повтор (retry) или в dead letter",
+    ["outcome"],
+)
+REQUEUED_BOOKINGS = Counter(
+    "stuck_bookings_requeued_total",
+    "Зависшие бронирования, заново поставленные в очередь",
+)
+STATUS_TRANSITIONS = Counter(
+    "booking_status_transitions_total",
+    "Переходы бронирований между статусами",
+    ["from_status", "to_status"],
+)
+SQL_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "Время выполнения SQL-запросов по типу операции",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def instrument_engine(sync_engine):
+    """Замер времени SQL-запросов через события engine"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, many):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        SQL_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def record_transition(from_status, to_status):
+    """Учет перехода бронирования между статусами"""
+    STATUS_TRANSITIONS.labels(from_status.value, to_status.value).inc()
+
+
+class PoolStatsCollector:
+    """Состояние пула соединений, снимаемое в момент scrape"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        for key, value in pool_stats(self.engine).items():
+            yield GaugeMetricFamily(
+                f"db_pool_{key}", f"Пул соединений БД: {key}", value=value
+            )
+
+
+def start_metrics_server(worker_index: int = 0):
+    """HTTP listener для /metrics; у каждого процесса-worker'а свой порт"""
+    start_http_server(settings.METRICS_PORT + worker_index)
+
+
+instrument_engine(engine.sync_engine)
+REGISTRY.register(PoolStatsCollector(engine))
@@ -1,11 +1,23 @@
 """Модели данных"""
 
-from datetime import datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    Enum as SQLEnum,
+    func,
+    text,
+)
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+UTC_NOW = text("timezone('utc', now())")
+
 
 class BookingStatus(str, Enum):
     """Статусы бронирования"""
@@ -25,8 +37,34 @@ class Restaurant(Base):
     name = Column(String, nullable=False)
     address = Column(String, nullable=False)
     description = Column(String, nullable=True)
+    # Сколько длится визит: на это время бронирование занимает стол
+    booking_duration_minutes = Column(
+        Integer, default=120, server_default=text("120"), nullable=False
+    )
+    updated_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
 
     bookings = relationship("Booking", back_populates="restaurant")
+    # Без столов ресторан работает по слотам: одно бронирование на время
+    tables = relationship("RestaurantTable", back_populates="restaurant")
+
+
+class RestaurantTable(Base):
+    """Стол ресторана; бронирование занимает один стол на время визита"""
+
+    __tablename__ = "restaurant_tables"
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(
+        Integer, ForeignKey("restaurants.id"), nullable=False, index=True
+    )
+    number = Column(String, nullable=False)
+    capacity = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("capacity > 0", name="ck_restaurant_tables_capacity"),
+    )
+
+    restaurant = relationship("Restaurant", back_populates="tables")
 
 
 class Booking(Base):
@@ -41,9 +79,31 @@ class Booking(Base):
     status = Column(
         SQLEnum(BookingStatus), default=BookingStatus.CREATED, nullable=False
     )
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Стол и длительность визита назначаются при подтверждении
+    table_id = Column(Integer, ForeignKey("restaurant_tables.id"), nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+    # Время проставляет БД (UTC), как и в API Service
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
     updated_at = Column(
-        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+        DateTime,
+        server_default=UTC_NOW,
+        onupdate=func.timezone("utc", func.now()),
+        nullable=False,
     )
 
+    __table_args__ = (
+        # Не больше одного подтвержденного бронирования на слот ресторана
+        # без столов; этот же индекс обслуживает проверку доступности
+        Index(
+            "uq_bookings_confirmed_slot",
+            "restaurant_id",
+            "booking_datetime",
+            unique=True,
+            postgresql_where=text("status = 'CONFIRMED' AND table_id IS NULL"),
+        ),
+    )
+
+    # Серверные значения (updated_at) забираются через RETURNING того же UPDATE
+    __mapper_args__ = {"eager_defaults": True}
+
     restaurant = relationship("Restaurant", back_populates="bookings")
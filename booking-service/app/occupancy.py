@@ -0,0 +1,159 @@
+"""In-memory индекс подтвержденных слотов ресторанов"""
+
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from aiokafka.partitioner import murmur2
+from sqlalchemy import select
+from app.config import settings
+from app.models import Booking, BookingStatus, Restaurant
+
+logger = logging.getLogger(__name__)
+
+
+def restaurant_partition(restaurant_id: int, partition_count: int) -> int:
+    """Партиция ресторана так же, как ее выбирает producer по ключу restaurant_id"""
+    return (murmur2(str(restaurant_id).encode("utf-8")) & 0x7FFFFFFF) % partition_count
+
+
+class SlotOccupancyIndex:
+    """
+    Подтвержденные слоты ресторанов, чьи партиции принадлежат consumer'у.
+
+    На ресторан и день хранится битовая маска минут суток (int на 1440 бит);
+    время с секундами, не попадающее на границу минуты, — отдельным
+    множеством. Индекс отвечает только за рестораны своих партиций и за дни
+    в пределах горизонта бронирования (BOOKING_HORIZON_DAYS), остальные
+    слоты проверяются в БД. Уникальный индекс uq_bookings_confirmed_slot
+    остается последней защитой, если индекс устарел.
+    """
+
+    def __init__(self, horizon_days: int = settings.BOOKING_HORIZON_DAYS):
+        self.horizon_days = horizon_days
+        self._days: dict[tuple[int, date], int] = {}
+        self._irregular: set[tuple[int, datetime]] = set()
+        self._partitions: set[int] = set()
+        self._partition_count = 0
+        self._owned: dict[int, bool] = {}
+        self._first_day: Optional[date] = None
+
+    def owns(self, restaurant_id: int) -> bool:
+        """Подтверждения ресторана делает только этот consumer"""
+        owned = self._owned.get(restaurant_id)
+        if owned is None:
+            owned = (
+                self._partition_count > 0
+                and restaurant_partition(restaurant_id, self._partition_count)
+                in self._partitions
+            )
+            self._owned[restaurant_id] = owned
+        return owned
+
+    def covers(self, restaurant_id: int, booking_datetime: datetime) -> bool:
+        """Индекс знает все подтвержденные бронирования этого слота"""
+        if not self._partitions or not self.owns(restaurant_id):
+            return False
+        self._evict_past()
+        day = booking_datetime.date()
+        return self._first_day <= day < self._first_day + timedelta(self.horizon_days)
+
+    def is_taken(self, restaurant_id: int, booking_datetime: datetime) -> bool:
+        """Слот подтвержден (результат осмыслен, только если covers)"""
+        minute = _minute_of_day(booking_datetime)
+        if minute is None:
+            return (restaurant_id, booking_datetime) in self._irregular
+        mask = self._days.get((restaurant_id, booking_datetime.date()), 0)
+        return bool(mask >> minute & 1)
+
+    def add(self, restaurant_id: int, booking_datetime: datetime):
+        """Отметка подтвержденного слота"""
+        if not self.covers(restaurant_id, booking_datetime):
+            return
+        minute = _minute_of_day(booking_datetime)
+        if minute is None:
+            self._irregular.add((restaurant_id, booking_datetime))
+            return
+        key = (restaurant_id, booking_datetime.date())
+        self._days[key] = self._days.get(key, 0) | 1 << minute
+
+    def _evict_past(self):
+        """Сдвиг горизонта: прошедшие дни больше не бронируются"""
+        today = datetime.utcnow().date()
+        if today <= self._first_day:
+            return
+        self._first_day = today
+        self._days = {k: v for k, v in self._days.items() if k[1] >= today}
+        self._irregular = {s for s in self._irregular if s[1].date() >= today}
+
+    async def warm(self, session_maker, partitions: set[int], partition_count: int):
+        """
+        Загрузка подтвержденных слотов назначенных партиций.
+
+        Рестораны своих партиций отбираются по списку ресторанов, а их
+        бронирования на горизонт читаются одним запросом по индексу
+        (restaurant_id, booking_datetime): каждый consumer группы читает
+        только свою долю бронирований. При ошибке индекс остается пустым
+        и все проверки идут в БД.
+        """
+        self.release()
+        if not partitions or not partition_count:
+            return
+
+        started = time.perf_counter()
+        first_day = datetime.utcnow().date()
+        window_start = datetime.combine(first_day, datetime.min.time())
+        try:
+            async with session_maker() as db:
+                restaurant_ids = await db.scalars(select(Restaurant.id))
+                owned = [
+                    restaurant_id
+                    for restaurant_id in restaurant_ids
+                    if restaurant_partition(restaurant_id, partition_count)
+                    in partitions
+                ]
+                rows = []
+                if owned:
+                    result = await db.execute(
+                        select(Booking.restaurant_id, Booking.booking_datetime).where(
+                            Booking.restaurant_id.in_(owned),
+                            Booking.status == BookingStatus.CONFIRMED,
+                            Booking.booking_datetime >= window_start,
+                            Booking.booking_datetime
+                            < window_start + timedelta(self.horizon_days),
+                        )
+                    )
+                    rows = result.tuples().all()
+        except Exception as e:
+            logger.error(f"Failed to warm slot index, using DB checks: {e}")
+            return
+
+        self._partitions = set(partitions)
+        self._partition_count = partition_count
+        self._owned.clear()
+        self._first_day = first_day
+        for restaurant_id, booking_datetime in rows:
+            self.add(restaurant_id, booking_datetime)
+        logger.info(
+            f"Slot index warmed: {len(self._days)} restaurant-days, "
+            f"{len(rows)} confirmed bookings scanned in "
+            f"{time.perf_counter() - started:.3f}s"
+        )
+
+    def release(self):
+        """Партиции отданы: индекс больше ни за что не отвечает"""
+        self._days.clear()
+        self._irregular.clear()
+        self._partitions = set()
+        self._partition_count = 0
+        self._owned.clear()
+
+
+def _minute_of_day(value: datetime) -> Optional[int]:
+    if value.second or value.microsecond:
+        return None
+    return value.hour * 60 + value.minute
+
+
+# Singleton instance
+slot_index = SlotOccupancyIndex()
@@ -0,0 +1,54 @@
+"""Учет обработанных offset'ов для ручного коммита в Kafka"""
+
+from aiokafka import TopicPartition
+
+
+class OffsetTracker:
+    """
+    Offset'ы, которые можно коммитить, по каждой партиции.
+
+    Пачки одной партиции завершаются не по порядку (рестораны обрабатываются
+    параллельно), поэтому коммитится offset первого еще не обработанного
+    сообщения: все сообщения до него гарантированно обработаны.
+    """
+
+    def __init__(self):
+        self._pending: dict[TopicPartition, set[int]] = {}
+        self._next: dict[TopicPartition, int] = {}
+        self._committed: dict[TopicPartition, int] = {}
+
+    def track(self, messages: list):
+        """Сообщения приняты в обработку"""
+        for m in messages:
+            tp = TopicPartition(m.topic, m.partition)
+            self._pending.setdefault(tp, set()).add(m.offset)
+
+    def complete(self, messages: list):
+        """Сообщения обработаны, их транзакция в БД закоммичена"""
+        for m in messages:
+            tp = TopicPartition(m.topic, m.partition)
+            # Партиция уже отдана другому consumer'у группы
+            if tp not in self._pending:
+                continue
+            self._pending[tp].discard(m.offset)
+            self._next[tp] = max(self._next.get(tp, 0), m.offset + 1)
+
+    def committable(self) -> dict[TopicPartition, int]:
+        """Offset'ы для коммита, изменившиеся с прошлого mark_committed"""
+        offsets = {}
+        for tp, next_offset in self._next.items():
+            pending = self._pending.get(tp)
+            offset = min(pending) if pending else next_offset
+            if offset > self._committed.get(tp, -1):
+                offsets[tp] = offset
+        return offsets
+
+    def mark_committed(self, offsets: dict[TopicPartition, int]):
+        self._committed.update(offsets)
+
+    def forget(self, partitions):
+        """Партиции отданы другому consumer'у группы"""
+        for tp in partitions:
+            self._pending.pop(tp, None)
+            self._next.pop(tp, None)
+            self._committed.pop(tp, None)
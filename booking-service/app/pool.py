@@ -0,0 +1,63 @@
+"""Пул соединений с метриками ожидания"""
+
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolWaitStats:
+    """Накопленная статистика получения соединений из пула"""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float):
+        self.acquisitions += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    QueuePool, считающий время ожидания соединения и таймауты.
+
+    Время включает установку нового соединения, если свободных нет,
+    но лимит overflow еще не исчерпан.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.timeouts += 1
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - started)
+
+
+def pool_stats(engine) -> dict:
+    """Текущее состояние пула соединений engine"""
+    pool = engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(
+            acquisitions=wait_stats.acquisitions,
+            timeouts=wait_stats.timeouts,
+            wait_seconds_total=round(wait_stats.wait_seconds_total, 6),
+            wait_seconds_max=round(wait_stats.wait_seconds_max, 6),
+        )
+    return stats
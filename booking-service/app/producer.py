@@ -0,0 +1,112 @@
+"""Kafka Producer событий изменения статуса бронирований"""
+
+import logging
+from aiokafka import AIOKafkaProducer
+from aiokafka.errors import KafkaError
+from app.codec import encode_event
+from app.config import settings
+from app.models import Booking, BookingStatus
+
+logger = logging.getLogger(__name__)
+
+
+class StatusEventPublisher:
+    """Публикация событий booking.status_changed и служебных событий consumer'а"""
+
+    def __init__(self):
+        self.producer = None
+        self.topic = settings.KAFKA_STATUS_TOPIC
+
+    async def connect(self):
+        """Подключение к Kafka"""
+        producer = AIOKafkaProducer(
+            bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS.split(","),
+            key_serializer=lambda k: None if k is None else str(k).encode("utf-8"),
+            linger_ms=5,
+        )
+        try:
+            await producer.start()
+        except KafkaError as e:
+            await producer.stop()
+            logger.error(f"Failed to connect status publisher: {e}")
+            raise
+
+        self.producer = producer
+        logger.info(f"Status publisher connected: {self.topic}")
+
+    async def publish(self, booking: Booking):
+        """Отправка события о новом статусе бронирования"""
+        await self._send(
+            {
+                "booking_id": booking.id,
+                "restaurant_id": booking.restaurant_id,
+                "booking_datetime": booking.booking_datetime.isoformat(),
+                "status": booking.status.value,
+            }
+        )
+
+    async def publish_checking(self, data: dict):
+        """
+        Отправка события о начале проверки доступности.
+
+        Статус CHECKING_AVAILABILITY в БД не записывается: проверка и
+        финальный статус занимают одну транзакцию. Событие строится из
+        данных booking.created и не требует обращения к БД.
+        """
+        await self._send(
+            {
+                "booking_id": data["booking_id"],
+                "restaurant_id": data.get("restaurant_id"),
+                "booking_datetime": data.get("booking_datetime"),
+                "status": BookingStatus.CHECKING_AVAILABILITY.value,
+            }
+        )
+
+    async def _send(self, data: dict):
+        """
+        Отправка события booking.status_changed.
+
+        Отправка не ждет подтверждения брокера: событие нужно только для
+        инвалидации кэшей, которые и так ограничены TTL.
+        """
+        if not self.producer:
+            return
+
+        event = {"event_type": "booking.status_changed", "data": data}
+        try:
+            value, headers = encode_event(event, settings.KAFKA_EVENT_CODEC)
+            await self.producer.send(
+                self.topic, value, key=data.get("restaurant_id"), headers=headers
+            )
+        except KafkaError as e:
+            logger.error(f"Failed to publish status event: {e}")
+
+    async def send_and_wait(self, topic: str, event: dict, key=None) -> bool:
+        """
+        Отправка события с ожиданием подтверждения брокера.
+
+        Используется для повторов, dead letter и повторной постановки
+        зависших бронирований: offset исходного сообщения коммитится только
+        после подтверждения. False, если producer не подключен или брокер
+        отказал.
+        """
+        if not self.producer:
+            return False
+        try:
+            value, headers = encode_event(event, settings.KAFKA_EVENT_CODEC)
+            await self.producer.send_and_wait(topic, value, key=key, headers=headers)
+        except KafkaError as e:
+            logger.error(f"Failed to send event to {topic}: {e}")
+            return False
+        return True
+
+    async def close(self):
+        """Закрытие соединения"""
+        if self.producer:
+            await self.producer.stop()
+            self.producer = None
+            logger.info("Status publisher closed")
+
+
+# Singleton instance
+status_publisher = StatusEventPublisher()
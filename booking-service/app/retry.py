@@ -0,0 +1,49 @@
+"""Отложенные повторы упавших событий и dead letter"""
+
+import time
+from datetime import datetime
+from app.config import settings
+
+
+def retry_attempt(event: dict) -> int:
+    """Номер попытки, которой было это событие (исходное событие — 0)"""
+    return event.get("retry", {}).get("attempt", 0)
+
+
+def retry_delay(attempt: int) -> float:
+    """Экспоненциальная задержка перед попыткой attempt (с 1)"""
+    return min(settings.RETRY_BASE_DELAY * 2 ** (attempt - 1), settings.RETRY_MAX_DELAY)
+
+
+def retry_at(event: dict) -> float:
+    """Время (unix), раньше которого повтор не обрабатывается; 0 — сразу"""
+    return event.get("retry", {}).get("retry_at", 0)
+
+
+def next_attempt(event: dict, error: Exception) -> tuple[str, dict]:
+    """
+    Топик и событие для следующей попытки упавшего события.
+
+    Пока попытки не исчерпаны (RETRY_MAX_ATTEMPTS), событие уходит
+    в KAFKA_RETRY_TOPIC с временем повтора; затем — в KAFKA_DLQ_TOPIC
+    с текстом последней ошибки.
+    """
+    attempt = retry_attempt(event) + 1
+    original = {k: v for k, v in event.items() if k not in ("retry", "dead_letter")}
+    if attempt > settings.RETRY_MAX_ATTEMPTS:
+        return settings.KAFKA_DLQ_TOPIC, {
+            **original,
+            "dead_letter": {
+                "attempts": attempt - 1,
+                "error": f"{type(error).__name__}: {error}",
+                "failed_at": datetime.utcnow().isoformat(),
+            },
+        }
+    return settings.KAFKA_RETRY_TOPIC, {
+        **original,
+        "retry": {
+            "attempt": attempt,
+            "retry_at": time.time() + retry_delay(attempt),
+            "error": f"{type(error).__name__}: {error}",
+        },
+    }
@@ -1,13 +1,66 @@
 """Сервис для обработки бронирований"""
 
 import logging
-from datetime import datetime
-from sqlalchemy import select, and_
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    and_,
+    case,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Booking, BookingStatus
+from sqlalchemy.orm import aliased
+from app.metrics import record_transition
+from app.availability import RestaurantSchedule
+from app.models import Booking, BookingStatus, Restaurant, RestaurantTable
+from app.occupancy import slot_index
 
 logger = logging.getLogger(__name__)
 
+# Статусы бронирований, еще ожидающих проверки; CHECKING_AVAILABILITY
+# остался в БД только у бронирований, начатых до однотранзакционной обработки
+PENDING_STATUSES = [BookingStatus.CREATED, BookingStatus.CHECKING_AVAILABILITY]
+
+# Назначение столов одного ресторана сериализуется advisory lock'ом
+# (namespace, restaurant_id) до конца транзакции; рестораны блокируются
+# по возрастанию id, чтобы пачки не взаимоблокировались
+TABLE_LOCK_NAMESPACE = 1001
+LOCK_RESTAURANTS = text(
+    "SELECT pg_advisory_xact_lock(:namespace, r) "
+    "FROM (SELECT unnest(CAST(:ids AS integer[])) AS r ORDER BY r) AS locked"
+)
+
+
+def _slot_taken():
+    """Условие "слот обновляемого бронирования уже подтвержден" для UPDATE"""
+    other = aliased(Booking)
+    return exists().where(
+        and_(
+            other.restaurant_id == Booking.restaurant_id,
+            other.booking_datetime == Booking.booking_datetime,
+            other.status == BookingStatus.CONFIRMED,
+        )
+    )
+
+
+def _has_tables():
+    """Условие "у ресторана обновляемого бронирования есть столы" для UPDATE"""
+    return exists().where(RestaurantTable.restaurant_id == Booking.restaurant_id)
+
+
+def _by_id(values: dict, else_=None):
+    """CASE по id бронирования; пустой словарь — просто else_"""
+    if not values:
+        return else_
+    return case(values, value=Booking.id, else_=else_)
+
 
 class BookingService:
     """Сервис проверки доступности и обработки бронирований"""
@@ -19,54 +72,351 @@ class BookingService:
         """
         Проверка доступности времени для бронирования.
 
-        Возвращает True, если нет конфликтующих бронирований.
+        Возвращает True, если нет конфликтующих бронирований. Для ресторанов
+        партиций этого consumer'а ответ дает in-memory индекс слотов.
         """
-        # Ищем бронирования на это же время в этом ресторане
-        query = select(Booking).where(
-            and_(
-                Booking.restaurant_id == restaurant_id,
-                Booking.booking_datetime == booking_datetime,
-                Booking.status == BookingStatus.CONFIRMED,
+        if slot_index.covers(restaurant_id, booking_datetime):
+            return not slot_index.is_taken(restaurant_id, booking_datetime)
+
+        # Ищем подтвержденное бронирование на это же время в этом ресторане;
+        # запрос целиком обслуживается частичным индексом uq_bookings_confirmed_slot
+        query = select(
+            exists().where(
+                and_(
+                    Booking.restaurant_id == restaurant_id,
+                    Booking.booking_datetime == booking_datetime,
+                    Booking.status == BookingStatus.CONFIRMED,
+                )
             )
         )
 
         result = await db.execute(query)
-        existing_booking = result.scalar_one_or_none()
-
-        return existing_booking is None
+        return not result.scalar()
 
     @staticmethod
-    async def process_booking(db: AsyncSession, booking_id: int):
+    async def process_booking(db: AsyncSession, booking_id: int) -> Booking | None:
         """
         Обработка бронирования: проверка доступности и обновление статуса.
+
+        Для ресторанов без столов проверка и запись выполняются одним
+        UPDATE ... SET status = CASE WHEN NOT EXISTS (...) в одной
+        транзакции. Если два consumer'а одновременно подтверждают один
+        слот, уникальный индекс uq_bookings_confirmed_slot отклоняет
+        второго; повтор того же UPDATE уже видит подтверждение победителя
+        и ставит REJECTED. Бронирования ресторанов со столами
+        обрабатываются через process_batch.
+
+        Возвращает бронирование в финальном статусе или None, если оно
+        не найдено или уже обработано.
         """
-        # Получаем бронирование
-        result = await db.execute(select(Booking).where(Booking.id == booking_id))
-        booking = result.scalar_one_or_none()
+        statement = (
+            update(Booking)
+            .where(
+                Booking.id == booking_id,
+                Booking.status.in_(PENDING_STATUSES),
+                ~_has_tables(),
+            )
+            .values(
+                status=case(
+                    (
+                        ~_slot_taken(),
+                        literal(BookingStatus.CONFIRMED, Booking.status.type),
+                    ),
+                    else_=literal(BookingStatus.REJECTED, Booking.status.type),
+                )
+            )
+            .returning(Booking)
+            .execution_options(populate_existing=True)
+        )
+
+        try:
+            booking = (await db.execute(statement)).scalar_one_or_none()
+            await db.commit()
+        except IntegrityError:
+            # Слот успел подтвердить другой consumer
+            await db.rollback()
+            booking = (await db.execute(statement)).scalar_one_or_none()
+            await db.commit()
 
         if not booking:
-            logger.error(f"Booking {booking_id} not found")
-            return
+            # Ресторан со столами: назначение стола
+            processed = await BookingService.process_batch(db, [booking_id])
+            if processed:
+                return processed[0]
+            logger.error(f"Booking {booking_id} not found or already processed")
+            return None
 
-        # Обновляем статус на CHECKING_AVAILABILITY
-        booking.status = BookingStatus.CHECKING_AVAILABILITY
-        await db.commit()
-        logger.info(f"Booking {booking_id}: status changed to CHECKING_AVAILABILITY")
+        # И CONFIRMED, и REJECTED означают, что слот подтвержден
+        slot_index.add(booking.restaurant_id, booking.booking_datetime)
+        record_transition(BookingStatus.CREATED, booking.status)
+
+        logger.info(
+            f"Booking {booking_id}: processing completed with status {booking.status}"
+        )
+        return booking
+
+    @staticmethod
+    async def process_batch(db: AsyncSession, booking_ids: list[int]) -> list[Booking]:
+        """
+        Обработка пачки бронирований.
+
+        Бронирования загружаются одним запросом, столы их ресторанов — вторым.
+        Бронирования ресторанов со столами получают стол (_assign_tables),
+        остальные — слот (_confirm_slots); каждая группа записывается одним
+        UPDATE и одним коммитом. Уже обработанные бронирования пропускаются.
+
+        Возвращает бронирования в финальном статусе, упорядоченные по id.
+        """
+        result = await db.execute(
+            select(Booking)
+            .where(
+                Booking.id.in_(booking_ids),
+                Booking.status.in_(PENDING_STATUSES),
+            )
+            .order_by(Booking.id)
+        )
+        bookings = result.scalars().all()
+        if not bookings:
+            return []
+
+        result = await db.execute(
+            select(
+                RestaurantTable.restaurant_id,
+                RestaurantTable.id,
+                RestaurantTable.capacity,
+                Restaurant.booking_duration_minutes,
+            )
+            .join(Restaurant, Restaurant.id == RestaurantTable.restaurant_id)
+            .where(
+                RestaurantTable.restaurant_id.in_({b.restaurant_id for b in bookings})
+            )
+        )
+        tables: dict[int, list[tuple[int, int]]] = {}
+        durations: dict[int, int] = {}
+        for restaurant_id, table_id, capacity, duration in result.tuples():
+            tables.setdefault(restaurant_id, []).append((table_id, capacity))
+            durations[restaurant_id] = duration
+
+        processed = []
+        with_tables = [b for b in bookings if b.restaurant_id in tables]
+        if with_tables:
+            processed += await BookingService._assign_tables(
+                db, with_tables, tables, durations
+            )
+        without_tables = [b for b in bookings if b.restaurant_id not in tables]
+        if without_tables:
+            processed += await BookingService._confirm_slots(db, without_tables)
+        return sorted(processed, key=lambda b: b.id)
 
-        # Проверяем доступность
-        is_available = await BookingService.check_availability(
-            db, booking.restaurant_id, booking.booking_datetime
+    @staticmethod
+    async def _assign_tables(
+        db: AsyncSession,
+        bookings: list[Booking],
+        tables: dict[int, list[tuple[int, int]]],
+        durations: dict[int, int],
+    ) -> list[Booking]:
+        """
+        Назначение столов с учетом вместимости и длительности визита.
+
+        Под advisory lock'ом ресторанов одним запросом загружаются визиты,
+        которые могут пересечься с бронированиями пачки (по окну на ресторан
+        и день), и раскладываются в расписания столов. Бронирования
+        обрабатываются по возрастанию id: каждому достается самый маленький
+        свободный стол, вмещающий гостей, или REJECTED.
+        """
+        await db.execute(
+            LOCK_RESTAURANTS,
+            {
+                "namespace": TABLE_LOCK_NAMESPACE,
+                "ids": sorted({b.restaurant_id for b in bookings}),
+            },
+        )
+
+        windows: dict[tuple[int, object], list[datetime]] = {}
+        for booking in bookings:
+            duration = timedelta(minutes=durations[booking.restaurant_id])
+            start = booking.booking_datetime
+            key = (booking.restaurant_id, start.date())
+            window = windows.setdefault(key, [start - duration, start + duration])
+            window[0] = min(window[0], start - duration)
+            window[1] = max(window[1], start + duration)
+
+        result = await db.execute(
+            select(
+                Booking.restaurant_id,
+                Booking.table_id,
+                Booking.booking_datetime,
+                Booking.duration_minutes,
+            ).where(
+                Booking.status == BookingStatus.CONFIRMED,
+                Booking.table_id.isnot(None),
+                or_(
+                    *(
+                        and_(
+                            Booking.restaurant_id == restaurant_id,
+                            Booking.booking_datetime > low,
+                            Booking.booking_datetime < high,
+                        )
+                        for (restaurant_id, _), (low, high) in windows.items()
+                    )
+                ),
+            )
         )
+        schedules = {
+            restaurant_id: RestaurantSchedule(restaurant_tables)
+            for restaurant_id, restaurant_tables in tables.items()
+        }
+        for restaurant_id, table_id, start, duration in result.tuples():
+            duration = duration or durations[restaurant_id]
+            schedules[restaurant_id].occupy(
+                table_id, start, start + timedelta(minutes=duration)
+            )
 
-        # Обновляем статус в зависимости от результата
-        if is_available:
-            booking.status = BookingStatus.CONFIRMED
-            logger.info(f"Booking {booking_id}: CONFIRMED")
-        else:
-            booking.status = BookingStatus.REJECTED
-            logger.info(f"Booking {booking_id}: REJECTED (time slot already booked)")
+        assigned: dict[int, int] = {}
+        assigned_durations: dict[int, int] = {}
+        for booking in bookings:
+            duration = durations[booking.restaurant_id]
+            start = booking.booking_datetime
+            table_id = schedules[booking.restaurant_id].assign(
+                start, start + timedelta(minutes=duration), booking.guests_count
+            )
+            if table_id is not None:
+                assigned[booking.id] = table_id
+                assigned_durations[booking.id] = duration
 
+        confirmed = literal(BookingStatus.CONFIRMED, Booking.status.type)
+        rejected = literal(BookingStatus.REJECTED, Booking.status.type)
+        result = await db.execute(
+            update(Booking)
+            .where(
+                Booking.id.in_([b.id for b in bookings]),
+                Booking.status.in_(PENDING_STATUSES),
+            )
+            .values(
+                status=_by_id(dict.fromkeys(assigned, confirmed), rejected),
+                table_id=_by_id(assigned),
+                duration_minutes=_by_id(assigned_durations),
+            )
+            .returning(Booking)
+            .execution_options(populate_existing=True)
+        )
+        bookings = result.scalars().all()
         await db.commit()
+
+        for booking in bookings:
+            record_transition(BookingStatus.CREATED, booking.status)
+        logger.info(f"Tables assigned for {len(assigned)} of {len(bookings)} bookings")
+        return bookings
+
+    @staticmethod
+    async def _confirm_slots(
+        db: AsyncSession, bookings: list[Booking]
+    ) -> list[Booking]:
+        """
+        Подтверждение слотов ресторанов без столов.
+
+        Занятость всех слотов проверяется одним запросом (или по in-memory
+        индексу), конфликты внутри пачки разрешаются в памяти (слот
+        достается бронированию с меньшим id), статусы записываются одним
+        UPDATE с той же проверкой NOT EXISTS, что и в process_booking.
+        """
+        # Слоты своих ресторанов проверяются по in-memory индексу, в БД
+        # идут только остальные
+        slots = {(b.restaurant_id, b.booking_datetime) for b in bookings}
+        unknown = {slot for slot in slots if not slot_index.covers(*slot)}
+        taken = {slot for slot in slots - unknown if slot_index.is_taken(*slot)}
+        if unknown:
+            result = await db.execute(
+                select(Booking.restaurant_id, Booking.booking_datetime).where(
+                    tuple_(Booking.restaurant_id, Booking.booking_datetime).in_(
+                        unknown
+                    ),
+                    Booking.status == BookingStatus.CONFIRMED,
+                )
+            )
+            taken.update(result.tuples().all())
+
+        pending_ids = [b.id for b in bookings]
+        confirmed_ids = []
+        for booking in bookings:
+            slot = (booking.restaurant_id, booking.booking_datetime)
+            if slot not in taken:
+                taken.add(slot)
+                confirmed_ids.append(booking.id)
+
+        try:
+            result = await db.execute(
+                update(Booking)
+                .where(
+                    Booking.id.in_(pending_ids),
+                    Booking.status.in_(PENDING_STATUSES),
+                )
+                .values(
+                    status=case(
+                        (
+                            and_(Booking.id.in_(confirmed_ids), ~_slot_taken()),
+                            literal(BookingStatus.CONFIRMED, Booking.status.type),
+                        ),
+                        else_=literal(BookingStatus.REJECTED, Booking.status.type),
+                    )
+                )
+                .returning(Booking)
+                .execution_options(populate_existing=True)
+            )
+            bookings = sorted(result.scalars().all(), key=lambda b: b.id)
+            await db.commit()
+        except IntegrityError:
+            # Слот успел подтвердить другой consumer: обрабатываем пачку
+            # поштучно, каждое бронирование в своей транзакции
+            await db.rollback()
+            logger.info("Batch hit a concurrently confirmed slot, falling back")
+            processed = [
+                await BookingService.process_booking(db, booking_id)
+                for booking_id in pending_ids
+            ]
+            return [b for b in processed if b is not None]
+
+        for booking in bookings:
+            record_transition(BookingStatus.CREATED, booking.status)
+            slot_index.add(booking.restaurant_id, booking.booking_datetime)
+        confirmed = sum(b.status == BookingStatus.CONFIRMED for b in bookings)
         logger.info(
-            f"Booking {booking_id}: processing completed with status {booking.status}"
+            f"Batch of {len(bookings)} bookings processed: "
+            f"{confirmed} CONFIRMED, {len(bookings) - confirmed} REJECTED"
+        )
+        return bookings
+
+    @staticmethod
+    async def claim_stuck(db: AsyncSession, stuck_before: datetime, limit: int):
+        """
+        Бронирования, ожидающие проверки с момента раньше stuck_before.
+
+        updated_at найденных строк сдвигается на текущее время, поэтому одно
+        бронирование ставится в очередь повторно не чаще раза за порог,
+        а строки, уже взятые параллельным sweeper'ом, пропускаются
+        (SKIP LOCKED). Транзакцию коммитит вызывающий, когда события
+        отправлены.
+        """
+        stuck = (
+            select(Booking.id)
+            .where(
+                Booking.status.in_(PENDING_STATUSES),
+                Booking.updated_at < stuck_before,
+            )
+            .order_by(Booking.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(Booking)
+            .where(Booking.id.in_(stuck.scalar_subquery()))
+            .values(updated_at=func.timezone("utc", func.now()))
+            .returning(
+                Booking.id,
+                Booking.restaurant_id,
+                Booking.booking_datetime,
+                Booking.guests_count,
+            )
+            .execution_options(synchronize_session=False)
         )
+        return result.all()
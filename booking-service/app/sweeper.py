@@ -0,0 +1,77 @@
+"""Повторная постановка в очередь зависших бронирований"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from app.config import settings
+from app.database import async_session_maker
+from app.metrics import REQUEUED_BOOKINGS
+from app.producer import status_publisher
+from app.services.booking_service import BookingService
+
+logger = logging.getLogger(__name__)
+
+
+class StuckBookingSweeper:
+    """
+    Поиск бронирований, слишком долго ожидающих проверки.
+
+    Такие бронирования остаются после потерянных событий (например,
+    событие ушло в dead letter или было отброшено до появления повторов).
+    Для каждого заново отправляется booking.created в основной топик;
+    уже обработанные бронирования consumer отсеет как дубли.
+    """
+
+    def __init__(self, session_maker=async_session_maker, publisher=status_publisher):
+        self.session_maker = session_maker
+        self.publisher = publisher
+
+    async def sweep(self) -> int:
+        """Один проход; возвращает число бронирований, поставленных в очередь"""
+        stuck_before = datetime.utcnow() - timedelta(
+            seconds=settings.SWEEPER_STUCK_AFTER
+        )
+        async with self.session_maker() as db:
+            rows = await BookingService.claim_stuck(
+                db, stuck_before, settings.SWEEPER_BATCH_SIZE
+            )
+            if not rows:
+                return 0
+
+            sent = await asyncio.gather(
+                *(
+                    self.publisher.send_and_wait(
+                        settings.KAFKA_TOPIC,
+                        {
+                            "event_type": "booking.created",
+                            "data": {
+                                "booking_id": row.id,
+                                "restaurant_id": row.restaurant_id,
+                                "booking_datetime": row.booking_datetime.isoformat(),
+                                "guests_count": row.guests_count,
+                            },
+                        },
+                        key=row.restaurant_id,
+                    )
+                    for row in rows
+                )
+            )
+            if not all(sent):
+                # updated_at не сдвигается: бронирования найдутся следующим проходом
+                await db.rollback()
+                logger.warning(f"Failed to re-enqueue {len(rows)} stuck bookings")
+                return 0
+            await db.commit()
+
+        REQUEUED_BOOKINGS.inc(len(rows))
+        logger.warning(f"Re-enqueued {len(rows)} stuck bookings")
+        return len(rows)
+
+    async def run(self):
+        """Проходы раз в SWEEPER_INTERVAL секунд до отмены задачи"""
+        while True:
+            await asyncio.sleep(settings.SWEEPER_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Stuck bookings sweep failed: {e}")
@@ -0,0 +1,38 @@
+"""Unit-тесты для назначения столов"""
+
+from datetime import datetime, timedelta
+from app.availability import RestaurantSchedule, TableSchedule
+
+EVENING = datetime(2030, 1, 1, 19, 0)
+VISIT = timedelta(hours=2)
+
+
+def test_table_schedule_overlaps():
+    """Тест: визиты пересекаются по полуинтервалам [начало, конец)"""
+    schedule = TableSchedule()
+    schedule.add(EVENING, EVENING + VISIT)
+
+    assert not schedule.is_free(EVENING + timedelta(minutes=15), EVENING + VISIT)
+    assert not schedule.is_free(EVENING - timedelta(hours=1), EVENING + timedelta(1))
+    assert schedule.is_free(EVENING + VISIT, EVENING + 2 * VISIT)
+    assert schedule.is_free(EVENING - VISIT, EVENING)
+
+
+def test_assign_smallest_fitting_table():
+    """Тест: назначается самый маленький свободный стол, вмещающий гостей"""
+    schedule = RestaurantSchedule([(1, 6), (2, 2), (3, 4)])
+
+    assert schedule.assign(EVENING, EVENING + VISIT, 3) == 3
+    assert schedule.assign(EVENING, EVENING + VISIT, 2) == 2
+    assert schedule.assign(EVENING, EVENING + VISIT, 4) == 1
+    assert schedule.assign(EVENING + timedelta(minutes=30), EVENING + VISIT, 1) is None
+    assert schedule.assign(EVENING, EVENING + VISIT, 8) is None
+
+
+def test_occupied_tables_skipped():
+    """Тест: уже подтвержденные визиты учитываются при назначении"""
+    schedule = RestaurantSchedule([(1, 4), (2, 4)])
+    schedule.occupy(1, EVENING - timedelta(hours=1), EVENING + timedelta(hours=1))
+
+    assert schedule.assign(EVENING, EVENING + VISIT, 4) == 2
+    assert schedule.assign(EVENING + timedelta(hours=1), EVENING + VISIT, 4) == 1
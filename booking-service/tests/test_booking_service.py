@@ -1,16 +1,20 @@
 """Unit-тесты для BookingService"""
 
+import asyncio
 import pytest
 import pytest_asyncio
 from datetime import datetime, timedelta
+from prometheus_client import REGISTRY
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
     async_sessionmaker,
 )
 from app.database import Base
-from app.models import Restaurant, Booking, BookingStatus
+from app.models import Restaurant, RestaurantTable, Booking, BookingStatus
+from app.occupancy import restaurant_partition, slot_index
 from app.services.booking_service import BookingService
+from app.sweeper import StuckBookingSweeper
 
 # Тестовая база данных
 TEST_DATABASE_URL = (
@@ -148,3 +152,275 @@ async def test_process_booking_rejected(test_restaurant, db_session):
 
     await db_session.refresh(new_booking)
     assert new_booking.status == BookingStatus.REJECTED
+
+
+@pytest.mark.asyncio
+async def test_concurrent_consumers_confirm_slot_once(
+    test_restaurant, test_session_maker, db_session
+):
+    """Тест: параллельные consumer'ы подтверждают слот ровно один раз"""
+    booking_datetime = datetime.utcnow() + timedelta(days=1)
+    bookings = [
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=booking_datetime,
+            guests_count=2,
+            status=BookingStatus.CREATED,
+        )
+        for _ in range(5)
+    ]
+    db_session.add_all(bookings)
+    await db_session.commit()
+
+    async def consume(booking_id):
+        async with test_session_maker() as session:
+            # Коммит откладывается, чтобы UPDATE'ы всех consumer'ов
+            # выполнились до первого коммита
+            commit = session.commit
+
+            async def delayed_commit():
+                await asyncio.sleep(0.05)
+                await commit()
+
+            session.commit = delayed_commit
+            return await BookingService.process_booking(session, booking_id)
+
+    processed = await asyncio.gather(*(consume(b.id) for b in bookings))
+
+    statuses = sorted(b.status.value for b in processed)
+    assert statuses == ["CONFIRMED"] + ["REJECTED"] * 4
+
+    # Повторная доставка события не меняет статус
+    assert await BookingService.process_booking(db_session, bookings[0].id) is None
+
+
+@pytest.mark.asyncio
+async def test_process_booking_records_transitions(test_restaurant, db_session):
+    """Тест: переходы статусов учитываются в метриках"""
+
+    def confirmed_count():
+        return (
+            REGISTRY.get_sample_value(
+                "booking_status_transitions_total",
+                {"from_status": "CREATED", "to_status": "CONFIRMED"},
+            )
+            or 0
+        )
+
+    before = confirmed_count()
+    booking = Booking(
+        restaurant_id=test_restaurant.id,
+        booking_datetime=datetime.utcnow() + timedelta(days=1),
+        guests_count=2,
+        status=BookingStatus.CREATED,
+    )
+    db_session.add(booking)
+    await db_session.commit()
+
+    await BookingService.process_booking(db_session, booking.id)
+
+    assert confirmed_count() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_process_batch_settles_conflicts_by_id(test_restaurant, db_session):
+    """Тест: в пачке слот достается бронированию с меньшим id"""
+    first_slot = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    second_slot = first_slot + timedelta(hours=2)
+    taken_slot = first_slot + timedelta(hours=4)
+
+    db_session.add(
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=taken_slot,
+            guests_count=2,
+            status=BookingStatus.CONFIRMED,
+        )
+    )
+    bookings = [
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=slot,
+            guests_count=2,
+            status=BookingStatus.CREATED,
+        )
+        for slot in (first_slot, first_slot, second_slot, taken_slot)
+    ]
+    db_session.add_all(bookings)
+    await db_session.commit()
+    ids = [b.id for b in bookings]
+
+    processed = await BookingService.process_batch(db_session, list(reversed(ids)))
+
+    assert [b.id for b in processed] == ids
+    assert [b.status for b in processed] == [
+        BookingStatus.CONFIRMED,
+        BookingStatus.REJECTED,
+        BookingStatus.CONFIRMED,
+        BookingStatus.REJECTED,
+    ]
+
+    # Повторная доставка тех же событий ничего не меняет
+    assert await BookingService.process_batch(db_session, ids) == []
+
+
+@pytest.mark.asyncio
+async def test_process_batch_with_stale_slot_index(
+    test_restaurant, test_session_maker, db_session
+):
+    """Тест: устаревший индекс слотов не приводит к двойному подтверждению"""
+    booking_datetime = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    await slot_index.warm(test_session_maker, {0}, 1)
+    try:
+        # Подтверждение, о котором индекс не знает
+        db_session.add(
+            Booking(
+                restaurant_id=test_restaurant.id,
+                booking_datetime=booking_datetime,
+                guests_count=2,
+                status=BookingStatus.CONFIRMED,
+            )
+        )
+        booking = Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=booking_datetime,
+            guests_count=2,
+            status=BookingStatus.CREATED,
+        )
+        db_session.add(booking)
+        await db_session.commit()
+        assert await BookingService.check_availability(
+            db_session, test_restaurant.id, booking_datetime
+        )
+
+        processed = await BookingService.process_batch(db_session, [booking.id])
+
+        assert processed[0].status == BookingStatus.REJECTED
+        assert slot_index.is_taken(test_restaurant.id, booking_datetime)
+    finally:
+        slot_index.release()
+
+
+@pytest.mark.asyncio
+async def test_warm_loads_only_owned_restaurants(
+    test_restaurant, test_session_maker, db_session
+):
+    """Тест: прогрев читает бронирования только ресторанов своих партиций"""
+    booking_datetime = datetime.utcnow().replace(
+        minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    db_session.add(
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=booking_datetime,
+            guests_count=2,
+            status=BookingStatus.CONFIRMED,
+        )
+    )
+    await db_session.commit()
+    own = restaurant_partition(test_restaurant.id, 2)
+
+    try:
+        await slot_index.warm(test_session_maker, {1 - own}, 2)
+        assert slot_index._days == {}
+
+        await slot_index.warm(test_session_maker, {own}, 2)
+        assert slot_index.is_taken(test_restaurant.id, booking_datetime)
+    finally:
+        slot_index.release()
+
+
+@pytest.mark.asyncio
+async def test_process_batch_assigns_tables(test_restaurant, db_session):
+    """Тест: ресторану со столами назначаются столы по вместимости и длительности"""
+    small = RestaurantTable(restaurant_id=test_restaurant.id, number="1", capacity=2)
+    large = RestaurantTable(restaurant_id=test_restaurant.id, number="2", capacity=4)
+    db_session.add_all([small, large])
+    evening = datetime.utcnow().replace(
+        hour=19, minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    requests = [
+        (evening, 4),
+        (evening + timedelta(minutes=30), 2),
+        (evening + timedelta(hours=1), 3),
+        (evening + timedelta(hours=2), 4),
+    ]
+    bookings = [
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=start,
+            guests_count=guests,
+            status=BookingStatus.CREATED,
+        )
+        for start, guests in requests
+    ]
+    db_session.add_all(bookings)
+    await db_session.commit()
+
+    processed = await BookingService.process_batch(db_session, [b.id for b in bookings])
+
+    assert [(b.status, b.table_id) for b in processed] == [
+        (BookingStatus.CONFIRMED, large.id),
+        (BookingStatus.CONFIRMED, small.id),
+        (BookingStatus.REJECTED, None),
+        (BookingStatus.CONFIRMED, large.id),
+    ]
+    assert processed[0].duration_minutes == 120
+
+    # Одиночная обработка учитывает уже назначенные столы
+    late = Booking(
+        restaurant_id=test_restaurant.id,
+        booking_datetime=evening + timedelta(hours=1, minutes=30),
+        guests_count=2,
+        status=BookingStatus.CREATED,
+    )
+    db_session.add(late)
+    await db_session.commit()
+
+    booking = await BookingService.process_booking(db_session, late.id)
+
+    assert booking.status == BookingStatus.REJECTED
+
+
+@pytest.mark.asyncio
+async def test_sweeper_requeues_stuck_bookings(
+    test_restaurant, db_session, test_session_maker
+):
+    """Тест: зависшие бронирования отправляются заново, не чаще раза за порог"""
+    booking_datetime = datetime.utcnow() + timedelta(days=1)
+    stale = datetime.utcnow() - timedelta(hours=1)
+    stuck, fresh, confirmed = (
+        Booking(
+            restaurant_id=test_restaurant.id,
+            booking_datetime=booking_datetime + timedelta(hours=i),
+            guests_count=2,
+            status=status,
+            updated_at=updated_at,
+        )
+        for i, (status, updated_at) in enumerate(
+            [
+                (BookingStatus.CREATED, stale),
+                (BookingStatus.CREATED, datetime.utcnow()),
+                (BookingStatus.CONFIRMED, stale),
+            ]
+        )
+    )
+    db_session.add_all([stuck, fresh, confirmed])
+    await db_session.commit()
+
+    sent = []
+
+    class Publisher:
+        async def send_and_wait(self, topic, event, key=None):
+            sent.append((topic, event, key))
+            return True
+
+    sweeper = StuckBookingSweeper(test_session_maker, Publisher())
+
+    assert await sweeper.sweep() == 1
+    topic, event, key = sent[0]
+    assert event["event_type"] == "booking.created"
+    assert event["data"]["booking_id"] == stuck.id
+    assert key == test_restaurant.id
+    # updated_at сдвинут: следующий проход бронирование не трогает
+    assert await sweeper.sweep() == 0
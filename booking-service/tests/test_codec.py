@@ -0,0 +1,50 @@
+"""Unit-тесты для кодеков событий Kafka"""
+
+from types import SimpleNamespace
+from app.codec import decode_event, encode_event
+from app.consumer import BookingEventConsumer
+from app.retry import next_attempt
+
+CREATED = {
+    "event_type": "booking.created",
+    "data": {
+        "booking_id": 1,
+        "restaurant_id": 7,
+        "booking_datetime": "2024-06-01T19:30:00",
+        "guests_count": 4,
+    },
+}
+
+
+def test_struct_codec_roundtrip():
+    """Тест: событие восстанавливается из бинарного формата без изменений"""
+    value, headers = encode_event(CREATED, "struct.v1")
+
+    assert headers == [("codec", b"struct.v1")]
+    assert len(value) < len(encode_event(CREATED, "json")[0])
+    assert decode_event(value, headers) == CREATED
+
+
+def test_retry_envelope_falls_back_to_json():
+    """Тест: событие с полями вне схемы (повтор) отправляется в JSON"""
+    _, retry = next_attempt(CREATED, RuntimeError("boom"))
+    value, headers = encode_event(retry, "struct.v1")
+
+    assert headers == [("codec", b"json")]
+    assert decode_event(value, headers) == retry
+
+
+def test_consumer_skips_undecodable_message():
+    """Тест: сообщение неизвестного формата становится пустым событием"""
+    message = SimpleNamespace(
+        topic="booking_events",
+        partition=0,
+        offset=5,
+        value=b"\x01",
+        headers=[("codec", b"struct.v1")],
+    )
+
+    assert BookingEventConsumer.decode(message) == {}
+    # Сообщения прежних producer'ов — JSON без заголовка
+    message.value, message.headers = b'{"event_type": "x", "data": {}}', []
+    assert BookingEventConsumer.decode(message) == {"event_type": "x", "data": {}}
@@ -0,0 +1,323 @@
+"""Unit-тесты для конкурентной обработки событий в BookingEventConsumer"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from aiokafka import TopicPartition
+from app.config import settings
+from app import consumer as consumer_module
+from app.consumer import BookingEventConsumer, PartitionRebalanceListener
+from app.metrics import CONSUMER_LAG
+from app.offsets import OffsetTracker
+from app.producer import status_publisher
+from app.retry import retry_delay
+from app.services.booking_service import BookingService
+
+
+def make_message(
+    offset: int, booking_id: int, restaurant_id: int, topic: str = "booking_events"
+):
+    """Сообщение Kafka в минимальном виде, нужном consumer'у"""
+    return SimpleNamespace(
+        topic=topic,
+        partition=0,
+        offset=offset,
+        value={
+            "event_type": "booking.created",
+            "data": {"booking_id": booking_id, "restaurant_id": restaurant_id},
+        },
+    )
+
+
+@pytest.fixture
+def consumer(monkeypatch):
+    """Consumer с записью порядка обработки вместо обращений к БД"""
+    monkeypatch.setattr(settings, "CONSUMER_MAX_IN_FLIGHT", 2)
+    consumer = BookingEventConsumer()
+    consumer.log = []
+    consumer.active = 0
+    consumer.max_active = 0
+
+    async def process_events(events):
+        consumer.active += 1
+        consumer.max_active = max(consumer.max_active, consumer.active)
+        # События первого ресторана обрабатываются дольше
+        slow = any(e["data"]["restaurant_id"] == 1 for e in events)
+        await asyncio.sleep(0.02 if slow else 0)
+        consumer.log.extend(e["data"]["booking_id"] for e in events)
+        consumer.active -= 1
+
+    consumer.process_events = process_events
+    return consumer
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Отправки с подтверждением брокера: (topic, event)"""
+    sent = []
+
+    async def send_and_wait(topic, event, key=None):
+        sent.append((topic, event))
+        return True
+
+    monkeypatch.setattr(status_publisher, "send_and_wait", send_and_wait)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_dispatch_keeps_order_within_restaurant(consumer):
+    """Тест: события одного ресторана обрабатываются в порядке чтения"""
+    messages = [
+        make_message(0, 1, restaurant_id=1),
+        make_message(1, 2, restaurant_id=2),
+        make_message(2, 3, restaurant_id=1),
+        make_message(3, 4, restaurant_id=2),
+    ]
+    for message in messages:
+        await consumer.dispatch([message])
+    await asyncio.wait(consumer._tasks)
+
+    assert [b for b in consumer.log if b in (1, 3)] == [1, 3]
+    assert [b for b in consumer.log if b in (2, 4)] == [2, 4]
+    # Быстрый ресторан не ждет медленный
+    assert consumer.log.index(2) < consumer.log.index(1)
+    assert consumer._restaurant_tails == {}
+
+
+@pytest.mark.asyncio
+async def test_dispatch_limits_in_flight_events(consumer):
+    """Тест: одновременно обрабатывается не больше CONSUMER_MAX_IN_FLIGHT"""
+    for i in range(6):
+        await consumer.dispatch([make_message(i, i, restaurant_id=100 + i)])
+        assert len(consumer._tasks) <= 2
+    await asyncio.wait(consumer._tasks)
+
+    assert sorted(consumer.log) == list(range(6))
+    assert consumer.max_active <= 2
+
+
+@pytest.mark.asyncio
+async def test_dispatch_batch_waits_for_each_restaurant(consumer):
+    """Тест: пачка ждет предыдущие события всех своих ресторанов"""
+    await consumer.dispatch([make_message(0, 1, restaurant_id=1)])
+    await consumer.dispatch([make_message(1, 2, restaurant_id=2)])
+    await consumer.dispatch(
+        [make_message(2, 3, restaurant_id=1), make_message(3, 4, restaurant_id=2)]
+    )
+    await asyncio.wait(consumer._tasks)
+
+    assert consumer.log == [2, 1, 3, 4]
+    assert consumer._restaurant_tails == {}
+
+
+@pytest.mark.asyncio
+async def test_partitions_revoked_after_in_flight_events(consumer):
+    """Тест: партиции отдаются только после завершения начатых обработок"""
+    await consumer.dispatch([make_message(0, 1, restaurant_id=1)])
+
+    listener = PartitionRebalanceListener(consumer)
+    await listener.on_partitions_revoked({TopicPartition("booking_events", 0)})
+
+    assert consumer.log == [1]
+    assert not consumer._tasks
+
+
+@pytest.mark.asyncio
+async def test_first_assignment_warms_slot_index(monkeypatch):
+    """Тест: назначение партиций внутри start() прогревает индекс слотов"""
+
+    class FakeKafkaConsumer:
+        def __init__(self, **kwargs):
+            self.listener = None
+
+        def subscribe(self, topics, listener):
+            self.listener = listener
+
+        async def start(self):
+            # aiokafka вызывает слушателя при первом join'е группы
+            await self.listener.on_partitions_assigned(
+                {TopicPartition(settings.KAFKA_TOPIC, 1)}
+            )
+
+        def partitions_for_topic(self, topic):
+            return {0, 1, 2}
+
+    warmed = []
+
+    async def warm(session_maker, partitions, partitions_count):
+        warmed.append((partitions, partitions_count))
+
+    monkeypatch.setattr(consumer_module, "AIOKafkaConsumer", FakeKafkaConsumer)
+    monkeypatch.setattr(consumer_module.slot_index, "warm", warm)
+
+    await BookingEventConsumer().connect()
+
+    assert warmed == [({1}, 3)]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_waiting_during_revocation_skipped(consumer):
+    """Тест: пачка, ждавшая лимита во время отдачи партиций, не запускается"""
+    await consumer.dispatch([make_message(0, 1, restaurant_id=1)])
+    await consumer.dispatch([make_message(1, 2, restaurant_id=1)])
+    waiting = asyncio.create_task(
+        consumer.dispatch([make_message(2, 3, restaurant_id=2)])
+    )
+    await asyncio.sleep(0)
+
+    listener = PartitionRebalanceListener(consumer)
+    await listener.on_partitions_revoked({TopicPartition("booking_events", 0)})
+    await waiting
+    await consumer.drain()
+
+    assert consumer.log == [1, 2]
+    assert consumer.offsets.committable() == {}
+
+
+def test_lag_recorded_for_each_partition_of_batch():
+    """Тест: отставание обновляется по каждой партиции пачки"""
+    consumer = BookingEventConsumer()
+    consumer.consumer = SimpleNamespace(highwater=lambda tp: 10)
+    messages = [make_message(offset, offset, restaurant_id=1) for offset in (2, 5, 3)]
+    messages[1].partition = 1
+
+    consumer.record_lag(messages)
+
+    lag = {
+        partition: CONSUMER_LAG.labels("booking_events", partition)._value.get()
+        for partition in (0, 1)
+    }
+    assert lag == {0: 6, 1: 4}
+
+
+def test_offset_tracker_commits_only_contiguous_offsets():
+    """Тест: коммитится offset первого необработанного сообщения"""
+    tracker = OffsetTracker()
+    tp = TopicPartition("booking_events", 0)
+    messages = [make_message(i, i, restaurant_id=i) for i in range(3)]
+    tracker.track(messages)
+
+    tracker.complete(messages[1:])
+    assert tracker.committable() == {tp: 0}
+    tracker.mark_committed({tp: 0})
+    assert tracker.committable() == {}
+
+    tracker.complete(messages[:1])
+    assert tracker.committable() == {tp: 3}
+
+    # Завершение после отдачи партиции не учитывается
+    tracker.forget({tp})
+    tracker.complete(messages)
+    assert tracker.committable() == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_offsets_not_completed(consumer):
+    """Тест: offset'ы упавшей пачки не коммитятся, если повтор не отправлен"""
+
+    async def failing(events):
+        raise RuntimeError("database is down")
+
+    consumer.process_events = failing
+    await consumer.dispatch([make_message(0, 1, restaurant_id=1)])
+    await consumer.drain()
+
+    assert consumer.offsets.committable() == {}
+
+
+@pytest.mark.asyncio
+async def test_redelivered_events_skipped(monkeypatch):
+    """Тест: повторно доставленное событие не обрабатывается второй раз"""
+    processed = []
+
+    async def process_batch(db, booking_ids):
+        processed.append(booking_ids)
+        return []
+
+    monkeypatch.setattr(BookingService, "process_batch", process_batch)
+    consumer = BookingEventConsumer()
+    events = [make_message(i, i, restaurant_id=1).value for i in (1, 2)]
+
+    await consumer.process_events(events)
+    await consumer.process_events(events)
+
+    assert processed == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_failed_event_scheduled_for_retry(consumer, sent):
+    """Тест: на повтор уходит только упавшее событие, партиция не блокируется"""
+
+    async def failing(events):
+        if any(e["data"]["booking_id"] == 2 for e in events):
+            raise RuntimeError("deadlock detected")
+        consumer.log.extend(e["data"]["booking_id"] for e in events)
+
+    consumer.process_events = failing
+    await consumer.dispatch([make_message(i, i + 1, restaurant_id=1) for i in range(3)])
+    await consumer.drain()
+
+    assert consumer.log == [1, 3]
+    assert [(topic, e["data"]["booking_id"]) for topic, e in sent] == [
+        (settings.KAFKA_RETRY_TOPIC, 2)
+    ]
+    retry = sent[0][1]["retry"]
+    assert retry["attempt"] == 1
+    assert "deadlock detected" in retry["error"]
+    assert consumer.offsets.committable() == {TopicPartition("booking_events", 0): 3}
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retries_go_to_dead_letter(consumer, sent):
+    """Тест: после RETRY_MAX_ATTEMPTS событие уходит в dead letter с ошибкой"""
+
+    async def failing(events):
+        raise RuntimeError("bad data")
+
+    consumer.process_events = failing
+    message = make_message(0, 1, restaurant_id=1, topic=settings.KAFKA_RETRY_TOPIC)
+    message.value["retry"] = {
+        "attempt": settings.RETRY_MAX_ATTEMPTS,
+        "retry_at": 0,
+        "error": "RuntimeError: bad data",
+    }
+    consumer.dispatch_retry(message)
+    await asyncio.sleep(0.01)
+    await consumer.drain()
+
+    topic, event = sent[0]
+    assert topic == settings.KAFKA_DLQ_TOPIC
+    assert "retry" not in event
+    assert event["data"]["booking_id"] == 1
+    assert event["dead_letter"]["attempts"] == settings.RETRY_MAX_ATTEMPTS
+    assert event["dead_letter"]["error"] == "RuntimeError: bad data"
+
+
+@pytest.mark.asyncio
+async def test_retry_processed_not_before_retry_at(consumer):
+    """Тест: повтор ждет своего времени, ожидающие повторы отменяются при drain"""
+    due = make_message(0, 1, restaurant_id=1, topic=settings.KAFKA_RETRY_TOPIC)
+    due.value["retry"] = {"attempt": 1, "retry_at": time.time() + 0.05}
+    later = make_message(1, 2, restaurant_id=1, topic=settings.KAFKA_RETRY_TOPIC)
+    later.value["retry"] = {"attempt": 1, "retry_at": time.time() + 60}
+    consumer.dispatch_retry(due)
+    consumer.dispatch_retry(later)
+
+    await asyncio.sleep(0.01)
+    assert consumer.log == []
+    await asyncio.sleep(0.1)
+    assert consumer.log == [1]
+
+    await consumer.drain()
+    assert consumer._delayed == {}
+    tp = TopicPartition(settings.KAFKA_RETRY_TOPIC, 0)
+    assert consumer.offsets.committable() == {tp: 1}
+
+
+def test_retry_delay_grows_exponentially(monkeypatch):
+    """Тест: задержка повтора удваивается и ограничена RETRY_MAX_DELAY"""
+    monkeypatch.setattr(settings, "RETRY_BASE_DELAY", 1.0)
+    monkeypatch.setattr(settings, "RETRY_MAX_DELAY", 5.0)
+
+    assert [retry_delay(attempt) for attempt in range(1, 5)] == [1.0, 2.0, 4.0, 5.0]
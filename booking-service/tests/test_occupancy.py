@@ -0,0 +1,56 @@
+"""Unit-тесты для in-memory индекса слотов"""
+
+from datetime import datetime, time, timedelta
+from app.occupancy import SlotOccupancyIndex, restaurant_partition
+
+
+def make_index(partitions={0}, partition_count=1) -> SlotOccupancyIndex:
+    """Индекс, которому назначены партиции, без загрузки из БД"""
+    index = SlotOccupancyIndex(horizon_days=30)
+    index._partitions = set(partitions)
+    index._partition_count = partition_count
+    index._first_day = datetime.utcnow().date()
+    return index
+
+
+def test_add_and_lookup_slots():
+    """Тест: подтвержденные слоты отмечаются с точностью до времени"""
+    index = make_index()
+    slot = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(19))
+    irregular = slot + timedelta(seconds=30)
+
+    index.add(1, slot)
+    index.add(1, irregular)
+
+    assert index.covers(1, slot)
+    assert index.is_taken(1, slot)
+    assert index.is_taken(1, irregular)
+    assert not index.is_taken(1, slot + timedelta(minutes=1))
+    assert not index.is_taken(2, slot)
+
+
+def test_covers_only_owned_restaurants_within_horizon():
+    """Тест: индекс не отвечает за чужие партиции и дни вне горизонта"""
+    owned = next(r for r in range(100) if restaurant_partition(r, 4) == 0)
+    foreign = next(r for r in range(100) if restaurant_partition(r, 4) != 0)
+    index = make_index(partitions={0}, partition_count=4)
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+
+    assert index.covers(owned, tomorrow)
+    assert not index.covers(foreign, tomorrow)
+    assert not index.covers(owned, tomorrow + timedelta(days=30))
+    assert not index.covers(owned, tomorrow - timedelta(days=2))
+
+    index.release()
+    assert not index.covers(owned, tomorrow)
+
+
+def test_past_days_evicted():
+    """Тест: прошедшие дни вытесняются при сдвиге горизонта"""
+    index = make_index()
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    index._first_day = yesterday
+    index._days[(1, yesterday)] = 1 << 20 * 60
+
+    assert index.covers(1, datetime.utcnow() + timedelta(hours=1))
+    assert index._days == {}